@@ -0,0 +1,187 @@
+'''
+Benchmarks of the field, curve and pairing operations of this library.
+
+Every case is timed on its own and reported in ops/sec together with the peak
+Python heap it allocates (tracemalloc, measured on a separate untimed call).
+tracemalloc does not see the mpz values of the gmpy2 backend, so with gmpy2 the
+column only covers the Python objects. The results can be written as JSON and
+compared against a stored baseline: the run fails when a case is slower than
+the baseline by more than the threshold.
+
+  python3 bench.py                                # print the results
+  python3 bench.py --save_baseline                # store them as the baseline
+  python3 bench.py --compare --threshold 0.25     # fail on regressions
+'''
+
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import resource
+import sys
+import time
+import tracemalloc
+
+from curve_field_elements import BACKEND, field_modulus, FQ, FQ2, FQ12
+from curve import G1, G2, curve_order, add, double, multiply, multiply_g1, multiply_g2
+from hash_to_curve import hash_to_g2
+from pairing import pairing, miller_loop_fp2, final_exponentiate
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'build', 'bench_baseline.json')
+
+def _cases(seed):
+    rng = random.Random(seed)
+    fq = lambda: FQ(rng.randrange(1, field_modulus))
+    fq2 = lambda: FQ2([rng.randrange(field_modulus), rng.randrange(1, field_modulus)])
+    fq12 = lambda: FQ12([rng.randrange(field_modulus) for _ in range(12)])
+    a, b = fq(), fq()
+    a2, b2 = fq2(), fq2()
+    a12, b12 = fq12(), fq12()
+    n = rng.randrange(curve_order)
+    p1, q1 = multiply(G1, rng.randrange(curve_order)), multiply(G1, rng.randrange(curve_order))
+    p2, q2 = multiply(G2, rng.randrange(curve_order)), multiply(G2, rng.randrange(curve_order))
+    f = miller_loop_fp2(G2, G1)
+    # Build the generator tables outside the timed calls
+    multiply_g1(n), multiply_g2(n)
+    return {
+        'fq_mul': lambda: a * b,
+        'fq_square': lambda: a * a,
+        'fq_inv': lambda: FQ.one() / a,
+        'fq2_mul': lambda: a2 * b2,
+        'fq2_square': lambda: a2.square(),
+        'fq2_inv': lambda: a2.inv(),
+        'fq12_mul': lambda: a12 * b12,
+        'fq12_square': lambda: a12.square(),
+        'fq12_inv': lambda: a12.inv(),
+        'g1_add': lambda: add(p1, q1),
+        'g1_double': lambda: double(p1),
+        'g1_multiply': lambda: multiply(p1, n),
+        'g1_fixed_base': lambda: multiply_g1(n),
+        'g2_add': lambda: add(p2, q2),
+        'g2_double': lambda: double(p2),
+        'g2_multiply': lambda: multiply(p2, n),
+        'g2_fixed_base': lambda: multiply_g2(n),
+        'hash_to_g2': lambda: hash_to_g2(b'benchmark'),
+        'miller_loop': lambda: miller_loop_fp2(G2, G1),
+        'final_exponentiate': lambda: final_exponentiate(f),
+        'pairing': lambda: pairing(G2, G1),
+    }
+
+# Best of `rounds` batches, each batch running for about min_time seconds
+def _time(fn, min_time, rounds):
+    fn()
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / 10:
+            break
+        number *= 10
+    number = max(1, int(number * min_time / elapsed))
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        per_op = (time.perf_counter() - start) / number
+        best = per_op if best is None else min(best, per_op)
+    return best, number
+
+# Peak of the Python heap during fn, without allocations made by gmpy2
+def _peak_py_heap(fn):
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def run(names=None, min_time=0.2, rounds=3, seed=0):
+    cases = _cases(seed)
+    results = {}
+    for name, fn in cases.items():
+        if names is not None and name not in names:
+            continue
+        seconds, number = _time(fn, min_time, rounds)
+        results[name] = {
+            'ops_per_sec': 1 / seconds,
+            'us_per_op': seconds * 1e6,
+            'number': number,
+            'py_heap_peak_bytes': _peak_py_heap(fn),
+        }
+    return {
+        'backend': BACKEND,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'results': results,
+    }
+
+# Cases slower than the baseline by more than threshold, as
+# (name, ops/sec, baseline ops/sec)
+def regressions(report, baseline, threshold):
+    out = []
+    for name, res in report['results'].items():
+        base = baseline['results'].get(name)
+        if base is not None and res['ops_per_sec'] < base['ops_per_sec'] * (1 - threshold):
+            out.append((name, res['ops_per_sec'], base['ops_per_sec']))
+    return out
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--filter', type=str, default=None, help='regular expression on the case names')
+    parser.add_argument('--min_time', type=float, default=0.2, help='seconds per timed batch')
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', type=str, default=None, help='write the results as JSON')
+    parser.add_argument('--baseline', type=str, default=DEFAULT_BASELINE)
+    parser.add_argument('--save_baseline', action='store_true', default=False)
+    parser.add_argument('--compare', action='store_true', default=False,
+                        help='exit with 1 if a case regressed against the baseline')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed slowdown, as a fraction')
+    args = parser.parse_args()
+
+    names = None
+    if args.filter:
+        names = [name for name in _cases(args.seed) if re.search(args.filter, name)]
+    report = run(names, args.min_time, args.rounds, args.seed)
+
+    if args.compare and not os.path.exists(args.baseline):
+        parser.error('no baseline at %s, store one with --save_baseline first' % args.baseline)
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        if baseline['backend'] != report['backend']:
+            print('warning: baseline was measured with the %s backend' % baseline['backend'])
+
+    print(f'{"case":<20}{"ops/sec":>14}{"us/op":>14}{"heap KiB":>12}{"vs base":>10}')
+    for name, res in report['results'].items():
+        base = baseline['results'].get(name) if baseline else None
+        ratio = f'{res["ops_per_sec"] / base["ops_per_sec"]:.2f}x' if base else '-'
+        print(f'{name:<20}{res["ops_per_sec"]:>14.1f}{res["us_per_op"]:>14.2f}'
+              f'{res["py_heap_peak_bytes"] / 1024:>12.1f}{ratio:>10}')
+    print(f'backend {report["backend"]}, max RSS {report["max_rss_kb"] / 1024:.1f} MiB')
+    if report['backend'] == 'gmpy2':
+        print('warning: heap KiB is the Python heap only, tracemalloc does not see gmpy2 allocations')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        slow = regressions(report, baseline, args.threshold)
+        for name, ops, base in slow:
+            print(f'REGRESSION {name}: {ops:.1f} ops/sec, baseline {base:.1f} ops/sec')
+        sys.exit(1 if slow else 0)
+
+if __name__ == '__main__':
+    main()
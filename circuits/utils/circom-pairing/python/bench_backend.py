@@ -0,0 +1,57 @@
+'''
+Compare the big integer backends of curve_field_elements on pairing(G2, G1).
+The backend is chosen at import time, so each one runs in its own interpreter.
+'''
+
+import argparse
+import importlib.util
+import os
+import subprocess
+import sys
+
+SNIPPET = '''
+import sys, time
+from curve import G1, G2
+from curve_field_elements import BACKEND
+from pairing import pairing
+repeat = int(sys.argv[1])
+pairing(G2, G1)
+start = time.perf_counter()
+for _ in range(repeat):
+    pairing(G2, G1)
+print(BACKEND, (time.perf_counter() - start) / repeat)
+'''
+
+def run(backend, repeat):
+    env = dict(os.environ, CIRCOM_PAIRING_BACKEND=backend)
+    proc = subprocess.run([sys.executable, '-c', SNIPPET, str(repeat)], env=env,
+                          cwd=os.path.dirname(os.path.abspath(__file__)),
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        # A backend that is not installed is skipped, any other failure is an
+        # error of the backend
+        if backend == 'gmpy2' and importlib.util.find_spec('gmpy2') is None:
+            return None
+        raise RuntimeError('%s backend failed:\n%s' % (backend, proc.stderr))
+    name, seconds = proc.stdout.strip().split('\n')[-1].split()
+    assert name == backend
+    return float(seconds)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--backends', type=str, nargs='+', default=['python', 'gmpy2'])
+    args = parser.parse_args()
+
+    results = {}
+    for backend in args.backends:
+        results[backend] = run(backend, args.repeat)
+        if results[backend] is None:
+            print(f'{backend:>8}: unavailable')
+        else:
+            print(f'{backend:>8}: {results[backend] * 1000:.2f} ms per pairing(G2, G1)')
+    if results.get('python') and results.get('gmpy2'):
+        print(f'speedup: {results["python"] / results["gmpy2"]:.2f}x')
+
+if __name__ == '__main__':
+    main()
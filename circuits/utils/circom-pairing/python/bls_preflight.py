@@ -0,0 +1,150 @@
+'''
+Off-chain preflight for header updates. Checks the aggregate BLS signature of
+the sync committee over the attested header, e(aggPk, H(signingRoot)) ==
+e(G1, sig), before verify_header is proven, and reports the participation the
+circuit will output as bitSum.
+
+The update is a file of the shape of test_data/header/*.json extended with
+  syncCommitteeBits       SSZ Bitvector[512] as hex, or a list of 0/1
+  syncCommitteeSignature  compressed signature, 96 bytes as hex
+The pubkeys file is a list of 512 compressed pubkeys (hex strings or byte
+lists), or a verify_syncCommittee input with pubkeyHex. A verify_header input
+can be checked directly with --circuit_input.
+'''
+
+import argparse
+import hashlib
+import json
+import sys
+import time
+
+from curve import G1, neg, sum_points, is_in_g2, batch_is_in_g1
+from compression import decompress_g1, decompress_g2
+from hash_to_curve import hash_to_g2
+from pairing import multi_pairing_is_one
+from registers import decode_g1, decode_g2
+
+SYNC_COMMITTEE_SIZE = 512
+DOMAIN_SYNC_COMMITTEE = bytes([7, 0, 0, 0])
+
+# Hex string, with or without 0x, or a list of byte values
+def parse_bytes(x):
+    if isinstance(x, str):
+        return bytes.fromhex(x[2:] if x.startswith('0x') else x)
+    return bytes(int(v) for v in x)
+
+def _sha256(*chunks):
+    return hashlib.sha256(b''.join(chunks)).digest()
+
+def _uint64(x):
+    return int(x).to_bytes(32, 'little')
+
+# hash_tree_root of a BeaconBlockHeader, as SimpleSerialize.sszBeaconBlockHeader
+def ssz_beacon_block_header(header):
+    left = _sha256(_sha256(_uint64(header['slot']), _uint64(header['proposerIndex'])),
+                   _sha256(parse_bytes(header['parentRoot']), parse_bytes(header['stateRoot'])))
+    right = _sha256(_sha256(parse_bytes(header['bodyRoot']), bytes(32)),
+                    _sha256(bytes(32), bytes(32)))
+    return _sha256(left, right)
+
+def compute_domain(fork_version, genesis_validators_root):
+    fork_data_root = _sha256(parse_bytes(fork_version).ljust(32, b'\x00'), parse_bytes(genesis_validators_root))
+    return DOMAIN_SYNC_COMMITTEE + fork_data_root[:28]
+
+def compute_signing_root(header, fork_version, genesis_validators_root):
+    return _sha256(ssz_beacon_block_header(header), compute_domain(fork_version, genesis_validators_root))
+
+# Participation bitmap as a list of 0/1, bit i of an SSZ bitvector is bit
+# i % 8 of byte i // 8
+def parse_bits(bits):
+    if isinstance(bits, str):
+        data = parse_bytes(bits)
+        bits = [(data[i // 8] >> (i % 8)) & 1 for i in range(8 * len(data))]
+    bits = [int(bit) for bit in bits]
+    if len(bits) != SYNC_COMMITTEE_SIZE or any(bit not in (0, 1) for bit in bits):
+        raise ValueError('expected a bitmap of %d bits' % SYNC_COMMITTEE_SIZE)
+    return bits
+
+def parse_pubkeys(data):
+    if isinstance(data, dict):
+        data = data['pubkeyHex']
+    if len(data) != SYNC_COMMITTEE_SIZE:
+        raise ValueError('expected %d pubkeys, got %d' % (SYNC_COMMITTEE_SIZE, len(data)))
+    return [parse_bytes(pk) for pk in data]
+
+# Verify the aggregate signature of the participating pubkeys (affine G1
+# points) over signing_root. The signature is an affine G2 point.
+def verify_aggregate(pubkeys, bits, signature, signing_root):
+    participants = [pk for pk, bit in zip(pubkeys, bits) if bit]
+    # KeyValidate: the point at infinity is not a valid pubkey
+    if any(pk is None for pk in participants):
+        return False
+    agg = sum_points(participants)
+    if agg is None or signature is None:
+        return False
+    if not is_in_g2(signature):
+        return False
+    return multi_pairing_is_one([(hash_to_g2(bytes(signing_root)), agg), (signature, neg(G1))])
+
+# Returns (valid, participation) for a light-client update and the compressed
+# pubkeys of its period. With check_pubkeys the participating pubkeys are also
+# checked to be in G1.
+def preflight(update, pubkeys, fork_version, genesis_validators_root, check_pubkeys=False):
+    bits = parse_bits(update['syncCommitteeBits'])
+    signing_root = compute_signing_root(update['attestedHeader'], fork_version, genesis_validators_root)
+    # Only the participating keys are needed
+    pubkeys = [parse_bytes(pk) for pk, bit in zip(pubkeys, bits) if bit]
+    try:
+        signature = decompress_g2(parse_bytes(update['syncCommitteeSignature']))
+        pubkeys = decompress_g1(pubkeys)
+    except ValueError:
+        return False, sum(bits)
+    if any(pk is None for pk in pubkeys):
+        return False, sum(bits)
+    if check_pubkeys and not all(batch_is_in_g1(pubkeys)):
+        return False, sum(bits)
+    return verify_aggregate(pubkeys, [1] * len(pubkeys), signature, signing_root), sum(bits)
+
+# Returns (valid, participation) for an input file of the verify_header circuit
+def preflight_circuit_input(data):
+    bits = [int(bit) for bit in data['pubkeybits']]
+    pubkeys = decode_g1(data['pubkeys'])
+    signature = decode_g2([data['signature']])[0]
+    signing_root = bytes(int(v) for v in data['signing_root'])
+    return verify_aggregate(pubkeys, bits, signature, signing_root), sum(bits)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--update', type=str, help='light-client update with syncCommitteeBits and syncCommitteeSignature')
+    parser.add_argument('--pubkeys', type=str, help='the 512 compressed pubkeys of the period')
+    parser.add_argument('--config', type=str, default='../../../../contracts/test/config/mainnet.json',
+                        help='file with genesisValidatorRoot and forkVersion, as contracts/test/config')
+    parser.add_argument('--check_pubkeys', action='store_true', default=False,
+                        help='also check that the participating pubkeys are in G1')
+    parser.add_argument('--circuit_input', type=str, help='check an input file of verify_header instead')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.circuit_input:
+        with open(args.circuit_input, 'r') as f:
+            valid, participation = preflight_circuit_input(json.load(f))
+    else:
+        if not args.update or not args.pubkeys:
+            parser.error('--update and --pubkeys are required without --circuit_input')
+        with open(args.update, 'r') as f:
+            update = json.load(f)
+        with open(args.pubkeys, 'r') as f:
+            pubkeys = parse_pubkeys(json.load(f))
+        with open(args.config, 'r') as f:
+            config = json.load(f)
+        valid, participation = preflight(update, pubkeys, config['forkVersion'], config['genesisValidatorRoot'],
+                                         args.check_pubkeys)
+    elapsed = time.perf_counter() - start
+
+    quorum = 3 * participation > 2 * SYNC_COMMITTEE_SIZE
+    print('participation: %d / %d%s' % (participation, SYNC_COMMITTEE_SIZE, '' if quorum else ' (below the 2/3 quorum)'))
+    print('signature: %s (%.3f s)' % ('valid' if valid else 'INVALID', elapsed))
+    sys.exit(0 if valid and quorum else 1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+'''
+Generates the constant tables of the circom-pairing circuits as one .circom
+include file per register layout, in a single pass:
+
+  get_BLS12_381_prime_<n>_<k>()            p
+  get_BLS12_381_final_exp_<n>_<k>()        (p**4 - p**2 + 1) / r, hard part of the final exponentiation
+  get_generator_G1_<n>_<k>()               G1
+  get_generator_G2_<n>_<k>()               G2
+  get_Fp12_frobenius_<n>_<k>()             coeff[j][i] = xi**(i * (p**j - 1) / 6), as print_fq12_frobenius_coeff
+  get_iso3_coeffs_<n>_<k>()                the 3-isogeny E2' -> E2 of hash_to_curve
+  get_psi_coeffs_<n>_<k>()                 the coefficients of the endomorphism psi
+
+The arrays have the shapes of the functions of bls12_381_func.circom with the
+same names, so the values can be used in their place. A file starts with a
+hash of everything it depends on and is only regenerated when that changes.
+'''
+
+import argparse
+import hashlib
+import os
+
+from curve_field_elements import field_modulus, FQ2, frobenius_coeffs
+from curve import G1, G2, PSI_X, PSI_Y, curve_order
+from hash_to_curve import ISO_X_NUM, ISO_X_DEN, ISO_Y_NUM, ISO_Y_DEN
+from registers import encode_ints
+
+CURVES = ('bls12-381',)
+
+# Bump when the layout of the generated files changes
+FORMAT_VERSION = 1
+
+DEFAULT_OUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'build', 'circom')
+
+def inputs_hash(n, k, xi, curve):
+    key = 'format=%d curve=%s p=%d r=%d n=%d k=%d xi=%d' % (FORMAT_VERSION, curve, field_modulus, curve_order, n, k, xi)
+    return hashlib.sha256(key.encode()).hexdigest()
+
+def _frobenius(xi):
+    if xi == 1:
+        return frobenius_coeffs()
+    q = field_modulus
+    return [[FQ2([xi, 1]) ** ((i * (q**j - 1) // 6) % (q**2 - 1)) for i in range(6)] for j in range(12)]
+
+# A circom function filling an array of shape dims, every value of the
+# {index tuple: integer} map becomes one row of k registers
+def _function(name, dims, values, n, k):
+    lines = ['function %s(){' % name, '    var out%s;' % ''.join('[%d]' % d for d in dims)]
+    keys = sorted(values)
+    for idx, regs in zip(keys, encode_ints([values[key] for key in keys], n, k, use_numpy=False)):
+        lines.append('    out%s = [%s];' % (''.join('[%d]' % i for i in idx), ', '.join(map(str, regs))))
+    lines += ['    return out;', '}', '']
+    return '\n'.join(lines)
+
+def _fq2(x):
+    return [int(x.c0), int(x.c1)]
+
+def _tables(n, k, xi):
+    final_exp = (field_modulus ** 4 - field_modulus ** 2 + 1) // curve_order
+    # Enough registers for the 1269-bit exponent
+    k_exp = -(-final_exp.bit_length() // n)
+    tables = [
+        ('get_BLS12_381_prime', [50], {(): field_modulus}, k),
+        ('get_BLS12_381_final_exp', [k_exp], {(): final_exp}, k_exp),
+        ('get_generator_G1', [2, 50], {(i,): int(G1[i].n) for i in range(2)}, k),
+        ('get_generator_G2', [2, 2, 50], {(i, j): _fq2(G2[i])[j] for i in range(2) for j in range(2)}, k),
+    ]
+    gamma = _frobenius(xi)
+    tables.append(('get_Fp12_frobenius', [12, 6, 2, 20],
+                   {(j, i, c): _fq2(gamma[j][i])[c] for j in range(12) for i in range(6) for c in range(2)}, k))
+    iso = {}
+    for a, coeffs in enumerate([ISO_X_NUM, ISO_X_DEN, ISO_Y_NUM, ISO_Y_DEN]):
+        for b in range(4):
+            c = coeffs[b] if b < len(coeffs) else FQ2.zero()
+            for e in range(2):
+                iso[(a, b, e)] = _fq2(c)[e]
+    tables.append(('get_iso3_coeffs', [4, 4, 2, 50], iso, k))
+    tables.append(('get_psi_coeffs', [2, 2, 50],
+                   {(i, j): _fq2(c)[j] for i, c in enumerate([PSI_X, PSI_Y]) for j in range(2)}, k))
+    return tables
+
+def render(n, k, xi=1, curve='bls12-381'):
+    out = ['// Generated by circom_constants.py, do not edit',
+           '// inputs: %s' % inputs_hash(n, k, xi, curve),
+           'pragma circom 2.0.3;', '']
+    for name, dims, values, regs in _tables(n, k, xi):
+        out.append(_function('%s_%d_%d' % (name, n, k), dims, values, n, regs))
+    return '\n'.join(out)
+
+def output_path(out_dir, n, k, xi=1, curve='bls12-381'):
+    suffix = '' if xi == 1 else '_xi%d' % xi
+    return os.path.join(out_dir, '%s_constants_%d_%d%s.circom' % (curve.replace('-', '_'), n, k, suffix))
+
+def _up_to_date(path, digest):
+    try:
+        with open(path, 'r') as f:
+            f.readline()
+            return f.readline().strip() == '// inputs: %s' % digest
+    except OSError:
+        return False
+
+# Write the include file for (n, k) unless an up to date one exists. Returns
+# (path, written).
+def generate(n, k, xi=1, curve='bls12-381', out_dir=DEFAULT_OUT_DIR, force=False):
+    if curve not in CURVES:
+        raise ValueError('unsupported curve %r' % curve)
+    if n * k < field_modulus.bit_length():
+        raise ValueError('%d registers of %d bits cannot hold the field elements' % (k, n))
+    # The last dimension of the Frobenius table, as in bls12_381_func.circom
+    if k > 20:
+        raise ValueError('at most 20 registers are supported')
+    path = output_path(out_dir, n, k, xi, curve)
+    if not force and _up_to_date(path, inputs_hash(n, k, xi, curve)):
+        return path, False
+    os.makedirs(out_dir, exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        f.write(render(n, k, xi, curve))
+    os.replace(tmp, path)
+    return path, True
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--layouts', type=str, nargs='+', default=['55,7', '77,5', '96,4'],
+                        help='register layouts as n,k')
+    parser.add_argument('--xi', type=int, default=1, help='FQ12 non-residue is xi + u')
+    parser.add_argument('--curve', type=str, default='bls12-381', choices=CURVES)
+    parser.add_argument('--out_dir', type=str, default=DEFAULT_OUT_DIR)
+    parser.add_argument('--force', action='store_true', default=False)
+    args = parser.parse_args()
+
+    for layout in args.layouts:
+        n, k = map(int, layout.split(','))
+        path, written = generate(n, k, args.xi, args.curve, args.out_dir, args.force)
+        print('%s %s' % ('wrote' if written else 'up to date', path))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+'''
+Writes the input files of verify_header.circom and verify_sync_committee.circom,
+input/${SLOT}_input.json and input/${PERIOD}_input.json of the run.sh scripts.
+
+  verify_header          signing_root, pubkeys, pubkeybits, signature
+  verify_sync_committee  pubkeys, pubkeyHex, aggregatePubkeyHex
+
+The updates and pubkeys files are those of bls_preflight. The JSON is written
+as it is encoded, a few pubkeys at a time, so the register arrays of a
+committee are never built up in memory next to the points. Header inputs for
+a range of slots are generated in parallel, one slot per worker task.
+'''
+
+import argparse
+import json
+import os
+
+from curve import sum_points
+from parallel import pool_imap
+from compression import compress_g1, decompress_g1, decompress_g2
+from registers import encode_g1, encode_g2, to_strings
+from bls_preflight import compute_signing_root, parse_bits, parse_bytes, parse_pubkeys
+
+SLOTS_PER_PERIOD = 8192
+
+# Pubkeys encoded per write
+WRITE_CHUNK = 64
+
+def _write_array(f, items):
+    f.write('[')
+    for i, item in enumerate(items):
+        if i:
+            f.write(',')
+        f.write(json.dumps(item, separators=(',', ':')))
+    f.write(']')
+
+# Write a JSON object whose values are iterables, each streamed as an array
+def _write_object(path, fields):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        f.write('{')
+        for i, (name, items) in enumerate(fields):
+            if i:
+                f.write(',')
+            f.write('%s:' % json.dumps(name))
+            _write_array(f, items)
+        f.write('}')
+    os.replace(tmp, path)
+
+def _pubkey_registers(pts):
+    for i in range(0, len(pts), WRITE_CHUNK):
+        yield from to_strings(encode_g1(pts[i:i + WRITE_CHUNK]))
+
+def _decompress_pubkeys(pubkeys, workers):
+    pts = decompress_g1([parse_bytes(pk) for pk in pubkeys], workers)
+    if any(pt is None for pt in pts):
+        raise ValueError('pubkey at infinity')
+    return pts
+
+def write_header_input(path, update, pubkeys, fork_version, genesis_validators_root, workers=None):
+    bits = parse_bits(update['syncCommitteeBits'])
+    signing_root = compute_signing_root(update['attestedHeader'], fork_version, genesis_validators_root)
+    signature = decompress_g2(parse_bytes(update['syncCommitteeSignature']))
+    if signature is None:
+        raise ValueError('signature at infinity')
+    pts = _decompress_pubkeys(pubkeys, workers)
+    _write_object(path, [
+        ('signing_root', [str(x) for x in signing_root]),
+        ('pubkeys', _pubkey_registers(pts)),
+        ('pubkeybits', bits),
+        ('signature', to_strings(encode_g2([signature])[0])),
+    ])
+
+# The aggregate pubkey of a committee is the sum of its pubkeys; a given one
+# is checked against it
+def write_sync_committee_input(path, pubkeys, aggregate_pubkey=None, workers=None):
+    pts = _decompress_pubkeys(pubkeys, workers)
+    aggregate = compress_g1(sum_points(pts))
+    if aggregate_pubkey is not None and parse_bytes(aggregate_pubkey) != aggregate:
+        raise ValueError('aggregate pubkey is not the sum of the pubkeys')
+    _write_object(path, [
+        ('pubkeys', _pubkey_registers(pts)),
+        ('pubkeyHex', ([str(x) for x in parse_bytes(pk)] for pk in pubkeys)),
+        ('aggregatePubkeyHex', [str(x) for x in aggregate]),
+    ])
+
+def _load_json(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+# Pubkeys of the period of slot, from a file or from <period>.json in a directory
+def _pubkeys_path(pubkeys, slot):
+    if os.path.isdir(pubkeys):
+        return os.path.join(pubkeys, '%d.json' % (slot // SLOTS_PER_PERIOD))
+    return pubkeys
+
+def _header_task(args):
+    update_path, pubkeys, config, out_dir = args
+    update = _load_json(update_path)
+    slot = int(update['finalizedHeader']['slot'])
+    path = os.path.join(out_dir, '%d_input.json' % slot)
+    # Already inside a worker process, decompress without another pool
+    write_header_input(path, update, parse_pubkeys(_load_json(_pubkeys_path(pubkeys, slot))),
+                       config['forkVersion'], config['genesisValidatorRoot'], workers=1)
+    return path
+
+# Write the header inputs of the updates <slot>.json in updates_dir with
+# first <= slot <= last
+def write_header_inputs(updates_dir, first, last, pubkeys, config, out_dir, workers=None):
+    slots = sorted(int(name[:-5]) for name in os.listdir(updates_dir)
+                   if name.endswith('.json') and name[:-5].isdigit())
+    tasks = [(os.path.join(updates_dir, '%d.json' % slot), pubkeys, config, out_dir)
+             for slot in slots if first <= slot <= last]
+    return list(pool_imap(_header_task, tasks, workers))
+
+def main():
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest='circuit', required=True)
+
+    header = subparsers.add_parser('header', help='inputs of verify_header')
+    header.add_argument('--update', type=str, help='a single light-client update')
+    header.add_argument('--updates_dir', type=str, help='directory of <slot>.json updates, with --slots')
+    header.add_argument('--slots', type=int, nargs=2, metavar=('FIRST', 'LAST'))
+    header.add_argument('--pubkeys', type=str, required=True,
+                        help='pubkeys file, or directory of <period>.json pubkeys files')
+    header.add_argument('--config', type=str, default='../../../../contracts/test/config/mainnet.json')
+    header.add_argument('--out_dir', type=str, default='../../../verify_header/input')
+    header.add_argument('--workers', type=int, default=None)
+
+    sync = subparsers.add_parser('sync_committee', help='inputs of verify_sync_committee')
+    sync.add_argument('--pubkeys', type=str, required=True)
+    sync.add_argument('--period', type=int, required=True)
+    sync.add_argument('--out_dir', type=str, default='../../../verify_syncCommittee/input')
+    sync.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    if args.circuit == 'sync_committee':
+        data = _load_json(args.pubkeys)
+        aggregate = data.get('aggregatePubkeyHex') if isinstance(data, dict) else None
+        path = os.path.join(args.out_dir, '%d_input.json' % args.period)
+        write_sync_committee_input(path, parse_pubkeys(data), aggregate, args.workers)
+        print(path)
+    elif args.update:
+        config = _load_json(args.config)
+        update = _load_json(args.update)
+        slot = int(update['finalizedHeader']['slot'])
+        path = os.path.join(args.out_dir, '%d_input.json' % slot)
+        write_header_input(path, update, parse_pubkeys(_load_json(_pubkeys_path(args.pubkeys, slot))),
+                           config['forkVersion'], config['genesisValidatorRoot'], args.workers)
+        print(path)
+    else:
+        if not args.updates_dir or not args.slots:
+            parser.error('header needs --update, or --updates_dir with --slots')
+        paths = write_header_inputs(args.updates_dir, args.slots[0], args.slots[1], args.pubkeys,
+                                    _load_json(args.config), args.out_dir, args.workers)
+        print('\n'.join(paths))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+'''
+Random input/output vectors for the BLS12-381 circuits, one JSON object per
+line with the signals in BigInt(n, k) registers as decimal strings:
+
+  fp12_multiply       Fp12Multiply(n, k, q)         a, b -> out
+  final_exponentiate  FinalExponentiate(n, k, q)    in -> out
+  miller_loop         MillerLoopFp2(n, k, [4,4], x, q)  P, Q -> out, xP
+  pairing             OptimalAtePairing(n, k, q)    P, Q -> out
+
+P is a point of G2 and Q one of G1, as in the circuits. The out of
+miller_loop is that of miller_loop_affine, which evaluates the line functions
+of the circuit exactly, so it is the circuit's out before any final
+exponentiation.
+
+Vector i of a run only depends on (op, seed, i), so the file is the same for
+any number of workers. Vectors are computed in chunks on a process pool and
+written in order as the chunks complete.
+
+  python3 circuit_vectors.py pairing --count 1000 --seed 0 --output pairing.jsonl
+'''
+
+import argparse
+import json
+import os
+import random
+
+from curve_field_elements import field_modulus, FQ12
+from curve import curve_order, multiply_g1, multiply_g2
+from pairing import miller_loop_affine, final_exponentiate, pairing
+from parallel import pool_imap
+from registers import N_BITS, K_REGISTERS, encode_fq12, encode_g1, encode_g2, to_strings
+
+# Vectors per worker task
+CHUNK_SIZE = 16
+
+def _fq12(rng):
+    return FQ12([rng.randrange(field_modulus) for _ in range(12)])
+
+def _g1(rng):
+    return multiply_g1(rng.randrange(1, curve_order))
+
+def _g2(rng):
+    return multiply_g2(rng.randrange(1, curve_order))
+
+def _fp12_multiply(rng, n, k):
+    a, b = _fq12(rng), _fq12(rng)
+    a_regs, b_regs, out = encode_fq12([a, b, a * b], n, k)
+    return {'a': a_regs, 'b': b_regs}, {'out': out}
+
+def _final_exponentiate(rng, n, k):
+    f = _fq12(rng)
+    f_regs, out = encode_fq12([f, final_exponentiate(f)], n, k)
+    return {'in': f_regs}, {'out': out}
+
+def _miller_loop(rng, n, k):
+    P, Q = _g2(rng), _g1(rng)
+    out, xP = miller_loop_affine(P, Q)
+    P_regs, xP_regs = encode_g2([P, xP], n, k)
+    return {'P': P_regs, 'Q': encode_g1([Q], n, k)[0]}, \
+           {'out': encode_fq12([out], n, k)[0], 'xP': xP_regs}
+
+def _pairing(rng, n, k):
+    P, Q = _g2(rng), _g1(rng)
+    return {'P': encode_g2([P], n, k)[0], 'Q': encode_g1([Q], n, k)[0]}, \
+           {'out': encode_fq12([pairing(P, Q)], n, k)[0]}
+
+OPS = {
+    'fp12_multiply': _fp12_multiply,
+    'final_exponentiate': _final_exponentiate,
+    'miller_loop': _miller_loop,
+    'pairing': _pairing,
+}
+
+def make_vector(op, seed, index, n=N_BITS, k=K_REGISTERS):
+    rng = random.Random('%s:%d:%d' % (op, seed, index))
+    inputs, outputs = OPS[op](rng, n, k)
+    return {'op': op, 'seed': seed, 'index': index, 'n': n, 'k': k,
+            'input': {name: to_strings(regs) for name, regs in inputs.items()},
+            'output': {name: to_strings(regs) for name, regs in outputs.items()}}
+
+def _vector_chunk(args):
+    op, seed, start, stop, n, k = args
+    return [json.dumps(make_vector(op, seed, i, n, k), separators=(',', ':')) for i in range(start, stop)]
+
+def _write_chunks(path, chunks):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        for lines in chunks:
+            f.write(''.join(line + '\n' for line in lines))
+    os.replace(tmp, path)
+
+# Write count vectors of op to path as JSONL
+def write_vectors(path, op, count, seed=0, n=N_BITS, k=K_REGISTERS, workers=None):
+    if op not in OPS:
+        raise ValueError('unknown op %r, expected one of %s' % (op, ', '.join(OPS)))
+    tasks = [(op, seed, i, min(i + CHUNK_SIZE, count), n, k) for i in range(0, count, CHUNK_SIZE)]
+    _write_chunks(path, pool_imap(_vector_chunk, tasks, workers))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('op', type=str, choices=sorted(OPS))
+    parser.add_argument('--count', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--n', type=int, default=N_BITS, help='bits per register')
+    parser.add_argument('--k', type=int, default=K_REGISTERS, help='registers per field element')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output', type=str, default=None, help='defaults to build/vectors/<op>_<seed>.jsonl')
+    args = parser.parse_args()
+
+    path = args.output or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'build', 'vectors',
+                                       '%s_%d.jsonl' % (args.op, args.seed))
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_vectors(path, args.op, args.count, args.seed, args.n, args.k, args.workers)
+    print('%d %s vectors written to %s' % (args.count, args.op, path))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+'''
+Point compression for BLS12-381 in the ZCash serialization format used by the
+Ethereum consensus layer: 48 bytes for points of G1 and 96 bytes for points of
+G2, where x.c1 comes before x.c0. The three most significant bits of the first
+byte are flags: compressed, point at infinity, and the sign of y (set when y is
+the lexicographically largest of y and -y).
+'''
+
+from curve_field_elements import field_modulus, FQ, FQ2
+from curve import b, b2
+from parallel import pool_map
+
+COMPRESSION_FLAG = 1 << 383
+INFINITY_FLAG = 1 << 382
+SIGN_FLAG = 1 << 381
+FLAGS_MASK = COMPRESSION_FLAG | INFINITY_FLAG | SIGN_FLAG
+
+# y is the lexicographically largest of y and -y
+def _sign_fq(y):
+    return y.n > (field_modulus - 1) // 2
+
+def _sign_fq2(y):
+    if y.c1 != 0:
+        return y.c1 > (field_modulus - 1) // 2
+    return y.c0 > (field_modulus - 1) // 2
+
+# Validate the flags of the leading 48 bytes, False for the point at infinity
+def _check_flags(z):
+    if not z & COMPRESSION_FLAG:
+        raise ValueError('point is not in compressed form')
+    if z & INFINITY_FLAG:
+        if z != COMPRESSION_FLAG | INFINITY_FLAG:
+            raise ValueError('invalid encoding of the point at infinity')
+        return False
+    return True
+
+def compress_g1(pt):
+    if pt is None:
+        return (COMPRESSION_FLAG | INFINITY_FLAG).to_bytes(48, 'big')
+    x, y = pt
+    z = int(x.n) | COMPRESSION_FLAG
+    if _sign_fq(y):
+        z |= SIGN_FLAG
+    return z.to_bytes(48, 'big')
+
+def compress_g2(pt):
+    if pt is None:
+        return (COMPRESSION_FLAG | INFINITY_FLAG).to_bytes(48, 'big') + bytes(48)
+    x, y = pt
+    z1 = int(x.c1) | COMPRESSION_FLAG
+    if _sign_fq2(y):
+        z1 |= SIGN_FLAG
+    return z1.to_bytes(48, 'big') + int(x.c0).to_bytes(48, 'big')
+
+def _decompress_g1(data):
+    if len(data) != 48:
+        raise ValueError('G1 points are 48 bytes, got %d' % len(data))
+    z = int.from_bytes(data, 'big')
+    if not _check_flags(z):
+        return None
+    x = z & ~FLAGS_MASK
+    if x >= field_modulus:
+        raise ValueError('x coordinate is not a field element')
+    x = FQ(x)
+    y = (x * x * x + b).sqrt()
+    if y is None:
+        raise ValueError('x coordinate is not on the curve')
+    if _sign_fq(y) != bool(z & SIGN_FLAG):
+        y = -y
+    return (x, y)
+
+def _decompress_g2(data):
+    if len(data) != 96:
+        raise ValueError('G2 points are 96 bytes, got %d' % len(data))
+    z1 = int.from_bytes(data[:48], 'big')
+    z0 = int.from_bytes(data[48:], 'big')
+    if not _check_flags(z1):
+        if z0:
+            raise ValueError('invalid encoding of the point at infinity')
+        return None
+    x1 = z1 & ~FLAGS_MASK
+    if x1 >= field_modulus or z0 >= field_modulus:
+        raise ValueError('x coordinate is not a field element')
+    x = FQ2([z0, x1])
+    y = (x.square() * x + b2).sqrt()
+    if y is None:
+        raise ValueError('x coordinate is not on the twisted curve')
+    if _sign_fq2(y) != bool(z1 & SIGN_FLAG):
+        y = -y
+    return (x, y)
+
+def _decompress(decompress, data, workers):
+    if isinstance(data, (bytes, bytearray)):
+        return decompress(bytes(data))
+    return pool_map(decompress, [bytes(d) for d in data], workers)
+
+# Decompress one 48-byte point, or a list of them (e.g. a whole sync
+# committee) spread over a pool of worker processes
+def decompress_g1(data, workers=None):
+    return _decompress(_decompress_g1, data, workers)
+
+# Decompress one 96-byte point, or a list of them
+def decompress_g2(data, workers=None):
+    return _decompress(_decompress_g2, data, workers)
@@ -5,14 +5,15 @@ https://github.com/ethereum/py_pairing/blob/master/py_ecc/bn128/bn128_curve.py
 '''
 
 
-from curve_field_elements import field_modulus, FQ, FQ2, FQ12
+import functools
+import hashlib
+import os
+import struct
 
-curve_order = 0x73eda753299d7d483339d80809a1d80553bda402fffe5bfeffffffff00000001
+from curve_field_elements import field_modulus, FQ, FQ2, FQ12, batch_inv
+from parallel import pool_map
 
-# Curve order should be prime
-assert pow(2, curve_order, curve_order) == 2
-# Curve order should be a factor of field_modulus**12 - 1
-assert (field_modulus ** 12 - 1) % curve_order == 0
+curve_order = 0x73eda753299d7d483339d80809a1d80553bda402fffe5bfeffffffff00000001
 
 # Curve is y**2 = x**3 + 4
 b = FQ(4)
@@ -31,8 +32,6 @@ X0 = 0x024aa2b2f08f0a91260805272dc51051c6e47ad4fa403b02b4510b647ae3d1770bac0326a
 X1 = 0x13e02b6052719f607dacd3a088274f65596bd0d09920b61ab5da61bbdc7f5049334cf11213945d57e5ac7d055d042b7e
 Y0 = 0x0ce5d527727d6e118cc9cdc6da2e351aadfd9baa8cbdd3a76d429a695160d12c923ac9cc3baca289e193548608b82801
 Y1 = 0x0606c4a02ea734cc32acd2b02bc28b99cb3e287e85a763af267492ab572e99ab3f370d275cec1da1aaa9075ff05f79be
-assert ((Y0**2 - Y1**2 - (4 + X0**3 - 3*X0*(X1**2))) % field_modulus == 0)
-assert ((2*Y0*Y1 - 3*(X0**2)*X1 + (X1**3) - 4) % field_modulus == 0)
 
 
 G2 = (FQ2([0x024aa2b2f08f0a91260805272dc51051c6e47ad4fa403b02b4510b647ae3d1770bac0326a805bbefd48056c8c121bdb8, 0x13e02b6052719f607dacd3a088274f65596bd0d09920b61ab5da61bbdc7f5049334cf11213945d57e5ac7d055d042b7e]),
@@ -47,56 +46,312 @@ def is_on_curve(pt, b):
     if is_inf(pt):
         return True
     x, y = pt
-    if isinstance((y**2-x**3), FQ12):
-      #print(x)
-      #print(y)
-      # print(y**2 - x**3)
-      print(y**2-x**3)
-      print(field_modulus)
-      u = (y**2-x**3).coeffs[0].n
-      v = (y**2-x**3).coeffs[6].n
     return y**2 - x**3 == b
 
-assert is_on_curve(G1, b)
-assert is_on_curve(G2, b2)
+# Points in Jacobian coordinates are tuples (X, Y, Z) representing the affine
+# point (X / Z**2, Y / Z**3). The formulas below work for points over FQ, FQ2
+# and FQ12 and never divide; as for affine points, None is the point at infinity.
+def to_jacobian(pt):
+    if pt is None:
+        return None
+    x, y = pt
+    return (x, y, x.one())
+
+# Convert back to affine coordinates with a single field inversion
+def from_jacobian(pt):
+    if pt is None:
+        return None
+    X, Y, Z = pt
+    zinv = Z.one() / Z
+    zinv2 = zinv * zinv
+    return (X * zinv2, Y * zinv2 * zinv)
+
+def jacobian_neg(pt):
+    if pt is None:
+        return None
+    X, Y, Z = pt
+    return (X, -Y, Z)
+
+# Elliptic curve doubling, dbl-2009-l (a = 0)
+def jacobian_double(pt):
+    if pt is None:
+        return None
+    X, Y, Z = pt
+    if Y == Y.zero():
+        return None
+    A = X * X
+    B = Y * Y
+    C = B * B
+    D = (X + B) * (X + B) - A - C
+    D = D + D
+    E = A + A + A
+    X3 = E * E - D - D
+    Y3 = E * (D - X3) - C * 8
+    Z3 = (Y + Y) * Z
+    return (X3, Y3, Z3)
+
+# Elliptic curve addition, add-2007-bl
+def jacobian_add(p1, p2):
+    if p1 is None or p2 is None:
+        return p1 if p2 is None else p2
+    X1, Y1, Z1 = p1
+    X2, Y2, Z2 = p2
+    Z1Z1 = Z1 * Z1
+    Z2Z2 = Z2 * Z2
+    U1 = X1 * Z2Z2
+    U2 = X2 * Z1Z1
+    S1 = Y1 * Z2 * Z2Z2
+    S2 = Y2 * Z1 * Z1Z1
+    H = U2 - U1
+    r = S2 - S1
+    if H == H.zero():
+        if r == r.zero():
+            return jacobian_double(p1)
+        return None
+    I = (H + H) * (H + H)
+    J = H * I
+    r = r + r
+    V = U1 * I
+    X3 = r * r - J - V - V
+    Y3 = r * (V - X3) - S1 * J * 2
+    Z3 = ((Z1 + Z2) * (Z1 + Z2) - Z1Z1 - Z2Z2) * H
+    return (X3, Y3, Z3)
+
+# Width-w non-adjacent form of n, least significant digit first. Every
+# non-zero digit is odd and smaller than 2**(w-1) in absolute value.
+def wnaf(n, w):
+    digits = []
+    while n:
+        if n & 1:
+            d = n & ((1 << w) - 1)
+            if d >= 1 << (w - 1):
+                d -= 1 << w
+            n -= d
+        else:
+            d = 0
+        digits.append(d)
+        n >>= 1
+    return digits
 
-print('TRUE')
+# Elliptic curve point multiplication with a width-w NAF of the scalar
+def jacobian_multiply(pt, n, w=4):
+    if pt is None or n == 0:
+        return None
+    if n < 0:
+        return jacobian_multiply(jacobian_neg(pt), -n, w)
+    # Odd multiples pt, 3 * pt, ..., (2**(w-1) - 1) * pt
+    dbl = jacobian_double(pt)
+    table = [pt]
+    for i in range((1 << (w - 2)) - 1):
+        table.append(jacobian_add(table[-1], dbl))
+    result = None
+    for d in reversed(wnaf(n, w)):
+        result = jacobian_double(result)
+        if d > 0:
+            result = jacobian_add(result, table[d >> 1])
+        elif d < 0:
+            result = jacobian_add(result, jacobian_neg(table[-d >> 1]))
+    return result
+
+# Convert many Jacobian points back to affine with one shared inversion
+def batch_from_jacobian(pts):
+    zinvs = iter(batch_inv([pt[2] for pt in pts if pt is not None]))
+    out = []
+    for pt in pts:
+        if pt is None:
+            out.append(None)
+            continue
+        X, Y, Z = pt
+        zinv = next(zinvs)
+        zinv2 = zinv * zinv
+        out.append((X * zinv2, Y * zinv2 * zinv))
+    return out
 
 # Elliptic curve doubling
 def double(pt):
-    x, y = pt
-    l = 3 * x**2 / (2 * y)
-    newx = l**2 - 2 * x
-    newy = -l * newx + l * x - y
-    return newx, newy
+    return from_jacobian(jacobian_double(to_jacobian(pt)))
 
 # Elliptic curve addition
 def add(p1, p2):
-    if p1 is None or p2 is None:
-        return p1 if p2 is None else p2
-    x1, y1 = p1
-    x2, y2 = p2
-    if x2 == x1 and y2 == y1:
-        return double(p1)
-    elif x2 == x1:
-        return None
-    else:
-        l = (y2 - y1) / (x2 - x1)
-    newx = l**2 - x1 - x2
-    newy = -l * newx + l * x1 - y1
-    assert newy == (-l * newx + l * x2 - y2)
-    return (newx, newy)
+    return from_jacobian(jacobian_add(to_jacobian(p1), to_jacobian(p2)))
 
 # Elliptic curve point multiplication
 def multiply(pt, n):
-    if n == 0:
+    return from_jacobian(jacobian_multiply(to_jacobian(pt), n))
+
+# Addition of a Jacobian and an affine point, madd-2007-bl
+def jacobian_add_affine(p1, pt):
+    if p1 is None:
+        return to_jacobian(pt)
+    if pt is None:
+        return p1
+    X1, Y1, Z1 = p1
+    x2, y2 = pt
+    Z1Z1 = Z1 * Z1
+    H = x2 * Z1Z1 - X1
+    r = y2 * Z1 * Z1Z1 - Y1
+    if H == H.zero():
+        if r == r.zero():
+            return jacobian_double(p1)
         return None
-    elif n == 1:
-        return pt
-    elif not n % 2:
-        return multiply(double(pt), n // 2)
+    HH = H * H
+    I = HH * 4
+    J = H * I
+    r = r + r
+    V = X1 * I
+    X3 = r * r - J - V - V
+    Y3 = r * (V - X3) - Y1 * J * 2
+    Z3 = (Z1 + H) * (Z1 + H) - Z1Z1 - HH
+    return (X3, Y3, Z3)
+
+# Fixed-base multiplication. The table of a point P holds, for every w-bit
+# window i of the scalar, the affine multiples j * 2**(w*i) * P for
+# 1 <= j <= 2**(w-1). A multiplication is then one mixed addition per window
+# and no doublings. Scalars are reduced modulo curve_order, so P must be in G1
+# or G2.
+FIXED_BASE_WINDOW = 8
+
+# Signed w-bit windows of n, least significant first, with digits in
+# (-2**(w-1), 2**(w-1)]
+def _signed_windows(n, w, count):
+    digits = []
+    for _ in range(count):
+        d = n & ((1 << w) - 1)
+        n >>= w
+        if d > 1 << (w - 1):
+            d -= 1 << w
+            n += 1
+        digits.append(d)
+    assert n == 0
+    return digits
+
+def fixed_base_table(pt, w=FIXED_BASE_WINDOW, cache_dir=None):
+    path = None
+    if cache_dir is not None:
+        path = os.path.join(cache_dir, 'fixed_base_%s_w%d.bin' % (_point_digest(pt), w))
+        if os.path.exists(path):
+            table = load_fixed_base_table(path)
+            if table[0][0] == pt and len(table[0]) == 1 << (w - 1):
+                return table
+    # The last window takes the carry of the signed digits
+    count = -(-curve_order.bit_length() // w) + 1
+    table = []
+    base = to_jacobian(pt)
+    for i in range(count):
+        row = [base]
+        for _ in range((1 << (w - 1)) - 1):
+            row.append(jacobian_add(row[-1], base))
+        row = batch_from_jacobian(row)
+        table.append(row)
+        base = jacobian_double(to_jacobian(row[-1]))
+    if path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        save_fixed_base_table(table, path)
+    return table
+
+def fixed_base_jacobian_multiply(table, n):
+    w = len(table[0]).bit_length()
+    result = None
+    for row, d in zip(table, _signed_windows(n % curve_order, w, len(table))):
+        if d > 0:
+            result = jacobian_add_affine(result, row[d - 1])
+        elif d < 0:
+            result = jacobian_add_affine(result, neg(row[-d - 1]))
+    return result
+
+def fixed_base_multiply(table, n):
+    return from_jacobian(fixed_base_jacobian_multiply(table, n))
+
+# Coordinates of a point as integers, FQ2 as [c0, c1]
+def _point_ints(pt):
+    return [int(c) for x in pt for c in ([x.n] if isinstance(x, FQ) else [x.c0, x.c1])]
+
+def _point_digest(pt):
+    return hashlib.sha256(b''.join(v.to_bytes(48, 'big') for v in _point_ints(pt))).hexdigest()[:16]
+
+# Tables are stored as the number of windows, the row length and the degree of
+# the field (1 for G1, 2 for G2), followed by all coordinates as 48-byte
+# big-endian integers
+def save_fixed_base_table(table, path):
+    degree = len(_point_ints(table[0][0])) // 2
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(struct.pack('<HHB', len(table), len(table[0]), degree))
+        for row in table:
+            f.write(b''.join(v.to_bytes(48, 'big') for pt in row for v in _point_ints(pt)))
+    os.replace(tmp, path)
+
+def load_fixed_base_table(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    count, length, degree = struct.unpack_from('<HHB', data)
+    offset = struct.calcsize('<HHB')
+    if len(data) != offset + count * length * 2 * degree * 48:
+        raise ValueError('truncated fixed-base table %s' % path)
+    values = [int.from_bytes(data[i:i + 48], 'big') for i in range(offset, len(data), 48)]
+    if degree == 1:
+        coords = [FQ(v) for v in values]
     else:
-        return add(multiply(double(pt), int(n // 2)), pt)
+        coords = [FQ2(values[i:i + 2]) for i in range(0, len(values), 2)]
+    pts = [(coords[i], coords[i + 1]) for i in range(0, len(coords), 2)]
+    return [pts[i:i + length] for i in range(0, len(pts), length)]
+
+# Tables of the generators, built on first use. With CIRCOM_PAIRING_TABLE_DIR
+# set they are stored there and loaded by later processes.
+TABLE_DIR = os.environ.get('CIRCOM_PAIRING_TABLE_DIR')
+
+@functools.lru_cache(maxsize=None)
+def _g1_table():
+    return fixed_base_table(G1, cache_dir=TABLE_DIR)
+
+@functools.lru_cache(maxsize=None)
+def _g2_table():
+    return fixed_base_table(G2, cache_dir=TABLE_DIR)
+
+# multiply(G1, n) and multiply(G2, n) through the generator tables
+def multiply_g1(n):
+    return fixed_base_multiply(_g1_table(), n)
+
+def multiply_g2(n):
+    return fixed_base_multiply(_g2_table(), n)
+
+# Affine addition of many independent pairs of points. All slopes share a
+# single inversion through batch_inv.
+def batch_add(pairs):
+    out = [None] * len(pairs)
+    idxs, nums, dens = [], [], []
+    for i, (p1, p2) in enumerate(pairs):
+        if p1 is None or p2 is None:
+            out[i] = p1 if p2 is None else p2
+            continue
+        x1, y1 = p1
+        x2, y2 = p2
+        if x1 != x2:
+            nums.append(y2 - y1)
+            dens.append(x2 - x1)
+        elif y1 == y2 and y1 != y1.zero():
+            nums.append(x1 * x1 * 3)
+            dens.append(y1 + y1)
+        else:
+            # p2 == -p1
+            continue
+        idxs.append(i)
+    for i, num, den_inv in zip(idxs, nums, batch_inv(dens)):
+        (x1, y1), (x2, y2) = pairs[i]
+        l = num * den_inv
+        newx = l * l - x1 - x2
+        out[i] = (newx, l * (x1 - newx) - y1)
+    return out
+
+# Sum a list of affine points as a binary tree, one inversion per level
+def sum_points(pts):
+    pts = [pt for pt in pts if pt is not None]
+    while len(pts) > 1:
+        summed = batch_add([(pts[i], pts[i+1]) for i in range(0, len(pts) - 1, 2)])
+        if len(pts) % 2:
+            summed.append(pts[-1])
+        pts = [pt for pt in summed if pt is not None]
+    return pts[0] if pts else None
 
 def eq(p1, p2):
     return p1 == p2
@@ -125,7 +380,81 @@ def twist(pt):
     # Divide x coord by w**2 and y coord by w**3
     return (nx / (w **2), ny / (w**3))
 
-G12 = twist(G2)
+# Untwist-Frobenius-twist endomorphism psi of the twisted curve, acting as
+# multiplication by field_modulus on G2. The coefficients are
+# 1 / (1 + u)**((p - 1) / 3) and 1 / (1 + u)**((p - 1) / 2).
+PSI_X = FQ2([0, 0x1a0111ea397fe699ec02408663d4de85aa0d857d89759ad4897d29650fb85f9b409427eb4f49fffd8bfd00000000aaad])
+PSI_Y = FQ2([0x135203e60180a68ee2e9c448d77a2cd91c3dedd930b1cf60ef396489f61eb45e304466cf3e67fa0af1ee7b04121bdea2, 0x06af0e0437ff400b6831e36d6bd17ffe48395dabc2d3435e77f76e17009241c5ee67992f72ec05f4c81084fbede3cc09])
+
+def psi(pt):
+    if pt is None:
+        return None
+    x, y = pt
+    return (x.conjugate() * PSI_X, y.conjugate() * PSI_Y)
+
+# BLS parameter x, curve_order = x**4 - x**2 + 1
+bls12_381_x = -0xd201000000010000
+
+# Cube root of unity for which (x, y) -> (BETA * x, y) acts as multiplication
+# by -x**2 on G1
+BETA = FQ(0x5f19672fdf76ce51ba69c6076a0f77eaddb3a93be6f89688de17d813620a00022e01fffffffefffe)
+
+# Check that the Jacobian point J is the affine point pt without an inversion
+def _jacobian_eq_affine(J, pt):
+    if J is None or pt is None:
+        return J is None and pt is None
+    X, Y, Z = J
+    x, y = pt
+    Z2 = Z * Z
+    return X == x * Z2 and Y == y * Z2 * Z
+
+# Subgroup checks of Scott (ePrint 2021/1130): a point of E(FQ) is in G1 iff
+# sigma(P) == [-x**2]P, and a point of E'(FQ2) is in G2 iff psi(P) == [x]P.
+# Both need a scalar multiplication of half or a quarter of the bit length of
+# curve_order.
+def is_in_g1(pt):
+    if pt is None:
+        return True
+    if not is_on_curve(pt, b):
+        return False
+    x, y = pt
+    return _jacobian_eq_affine(jacobian_multiply(to_jacobian(pt), -bls12_381_x ** 2), (x * BETA, y))
+
+def is_in_g2(pt):
+    if pt is None:
+        return True
+    if not is_on_curve(pt, b2):
+        return False
+    return _jacobian_eq_affine(jacobian_multiply(to_jacobian(pt), bls12_381_x), psi(pt))
+
+# Subgroup checks of whole committees
+def batch_is_in_g1(pts, workers=None):
+    return pool_map(is_in_g1, pts, workers)
+
+def batch_is_in_g2(pts, workers=None):
+    return pool_map(is_in_g2, pts, workers)
+
+# G2 twisted into E(FQ12), computed on first access to curve.G12
+@functools.lru_cache(maxsize=None)
+def _g12():
+    return twist(G2)
+
+def __getattr__(name):
+    if name == 'G12':
+        return _g12()
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
 
-# Check that the twist creates a point that is on the curve
-assert is_on_curve(G12, b12)
\ No newline at end of file
+# Consistency checks of the constants above, run by pairing.self_test
+def self_test():
+    # Curve order should be prime
+    assert pow(2, curve_order, curve_order) == 2
+    # Curve order should be a factor of field_modulus**12 - 1
+    assert (field_modulus ** 12 - 1) % curve_order == 0
+    assert ((Y0**2 - Y1**2 - (4 + X0**3 - 3*X0*(X1**2))) % field_modulus == 0)
+    assert ((2*Y0*Y1 - 3*(X0**2)*X1 + (X1**3) - 4) % field_modulus == 0)
+    assert is_on_curve(G1, b)
+    assert is_on_curve(G2, b2)
+    # Check that the twist creates a point that is on the curve
+    assert is_on_curve(_g12(), b12)
+    assert is_in_g1(G1) and is_in_g2(G2)
+    assert psi(G2) == multiply(G2, field_modulus)
\ No newline at end of file
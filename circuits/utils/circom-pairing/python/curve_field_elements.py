@@ -2,10 +2,15 @@
 MODIFIED FROM https://github.com/ethereum/py_pairing/blob/master/py_ecc/bn128/bn128_field_elements.py
 '''
 
+import json
+import os
+
 # The prime modulus of the field
 field_modulus = 0x1a0111ea397fe69a4b1ba7b6434bacd764774b84f38512bf6730d2a0f6b0f6241eabfffeb153ffffb9feffffffffaaab
 # See, it's prime!
 assert pow(2, field_modulus, field_modulus) == 2
+# q = 3 mod 4, so square roots are exponentiations, see FQ.sqrt and FQ2.sqrt
+assert field_modulus % 4 == 3
 
 # The modulus of the polynomial in this representation of FQ12
 # F_{q^2} = F_q[u] / (u^2 + 1)
@@ -17,7 +22,7 @@ FQ12_modulus_coeffs = [2, 0, 0, 0, 0, 0, -2, 0, 0, 0, 0, 0] # Implied + [1]
 
 # Extended euclidean algorithm to find modular inverses for
 # integers
-def inv(a, n):
+def _inv_python(a, n):
     if a == 0:
         return 0
     lm, hm = 1, 0
@@ -28,23 +33,69 @@ def inv(a, n):
         lm, low, hm, high = nm, new, lm, low
     return lm % n
 
+# Big integer backend for the field arithmetic. gmpy2's mpz, invert and
+# powmod are used when gmpy2 is installed; set CIRCOM_PAIRING_BACKEND=python
+# to force the pure Python implementation. field_modulus stays a Python int
+# either way, elements hold values of type mpz.
+try:
+    import gmpy2
+except ImportError:
+    gmpy2 = None
+
+BACKEND = os.environ.get('CIRCOM_PAIRING_BACKEND', 'gmpy2' if gmpy2 is not None else 'python')
+assert BACKEND in ('gmpy2', 'python'), BACKEND
+
+if BACKEND == 'gmpy2':
+    mpz = gmpy2.mpz
+    int_types = (int, type(mpz(0)))
+    powmod = gmpy2.powmod
+
+    def inv(a, n):
+        a = a % n
+        return gmpy2.invert(a, n) if a else mpz(0)
+else:
+    mpz = int
+    int_types = (int,)
+    powmod = pow
+    inv = _inv_python
+
+_modulus = mpz(field_modulus)
+_new = object.__new__
+
+# Exponents for square roots in FQ and FQ2
+_sqrt_exp = (field_modulus + 1) // 4
+_fq2_sqrt_exp = (field_modulus - 3) // 4
+_fq2_sqrt_exp_b = (field_modulus - 1) // 2
+
+def _fq(n):
+    r = _new(FQ)
+    r.n = n % _modulus
+    return r
+
+def _scalar(other):
+    on = other.n if isinstance(other, FQ) else other
+    assert isinstance(on, int_types)
+    return on
+
 # A class for field elements in FQ. Wrap a number in this class,
 # and it becomes a field element.
 class FQ():
+    __slots__ = ('n',)
+
     def __init__(self, n):
         if isinstance(n, self.__class__):
             self.n = n.n
         else:
-            self.n = n % field_modulus
-        assert isinstance(self.n, (int,))
+            self.n = mpz(n) % _modulus
+        assert isinstance(self.n, int_types)
 
     def __add__(self, other):
         on = other.n if isinstance(other, FQ) else other
-        return FQ((self.n + on) % field_modulus)
+        return _fq(self.n + on)
 
     def __mul__(self, other):
         on = other.n if isinstance(other, FQ) else other
-        return FQ((self.n * on) % field_modulus)
+        return _fq(self.n * on)
 
     def __rmul__(self, other):
         return self * other
@@ -54,37 +105,26 @@ class FQ():
 
     def __rsub__(self, other):
         on = other.n if isinstance(other, FQ) else other
-        return FQ((on - self.n) % field_modulus)
+        return _fq(on - self.n)
 
     def __sub__(self, other):
         on = other.n if isinstance(other, FQ) else other
-        return FQ((self.n - on) % field_modulus)
+        return _fq(self.n - on)
 
     def __div__(self, other):
-        on = other.n if isinstance(other, FQ) else other
-        assert isinstance(on, (int,))
-        return FQ(self.n * inv(on, field_modulus) % field_modulus)
+        return _fq(self.n * inv(_scalar(other), _modulus))
 
     def __truediv__(self, other):
         return self.__div__(other)
 
     def __rdiv__(self, other):
-        on = other.n if isinstance(other, FQ) else other
-        assert isinstance(on, (int,)), on
-        return FQ(inv(self.n, field_modulus) * on % field_modulus)
+        return _fq(inv(self.n, _modulus) * _scalar(other))
 
     def __rtruediv__(self, other):
         return self.__rdiv__(other)
 
     def __pow__(self, other):
-        if other == 0:
-            return FQ(1)
-        elif other == 1:
-            return FQ(self.n)
-        elif other % 2 == 0:
-            return (self * self) ** (other // 2)
-        else:
-            return ((self * self) ** int(other // 2)) * self
+        return _fq(powmod(self.n, other, _modulus))
 
     def __eq__(self, other):
         if isinstance(other, FQ):
@@ -99,7 +139,16 @@ class FQ():
         return FQ(-self.n)
 
     def __repr__(self):
-        return repr(self.n)
+        return repr(int(self.n))
+
+    # A square root of x, or None if x is not a square
+    def sqrt(self):
+        r = _fq(powmod(self.n, _sqrt_exp, _modulus))
+        return r if r * r == self else None
+
+    # x^(q^k) = x on the prime field
+    def frobenius(self, k=1):
+        return self
 
     @classmethod
     def one(cls):
@@ -109,6 +158,28 @@ class FQ():
     def zero(cls):
         return cls(0)
 
+# Montgomery's trick: invert every element of a list of FQ, FQ2 or FQ12
+# values with a single field inversion and 3(N-1) multiplications.
+# As with inv(), zero elements map to zero.
+def batch_inv(elements):
+    if not elements:
+        return []
+    one, zero = elements[0].one(), elements[0].zero()
+    prefix = []
+    acc = one
+    for x in elements:
+        prefix.append(acc)
+        if x != zero:
+            acc = acc * x
+    acc_inv = one / acc
+    out = [zero] * len(elements)
+    for i in range(len(elements) - 1, -1, -1):
+        x = elements[i]
+        if x != zero:
+            out[i] = acc_inv * prefix[i]
+            acc_inv = acc_inv * x
+    return out
+
 # Utility methods for polynomial math
 def deg(p):
     d = len(p) - 1
@@ -146,7 +217,7 @@ class FQP():
         return self.__class__([x-y for x,y in zip(self.coeffs, other.coeffs)])
 
     def __mul__(self, other):
-        if isinstance(other, (FQ, int,)):
+        if isinstance(other, (FQ,) + int_types):
             return self.__class__([c * other for c in self.coeffs])
         else:
             assert isinstance(other, self.__class__)
@@ -164,7 +235,7 @@ class FQP():
         return self * other
 
     def __div__(self, other):
-        if isinstance(other, (FQ, int,)):
+        if isinstance(other, (FQ,) + int_types):
             return self.__class__([c / other for c in self.coeffs])
         else:
             assert isinstance(other, self.__class__)
@@ -174,6 +245,8 @@ class FQP():
         return self.__div__(other)
 
     def __pow__(self, other):
+        if other < 0:
+            return self.inv() ** -other
         if other == 0:
             return self.__class__([1] + [0] * (self.degree - 1))
         elif other == 1:
@@ -224,18 +297,531 @@ class FQP():
     def zero(cls):
         return cls([0] * cls.degree)
 
-# The quadratic extension field
-class FQ2(FQP):
+# Flat polynomial representations of the quadratic and 12th-degree
+# extension fields. FQ2 and FQ12 below are built as a tower instead; these
+# are kept as a reference for cross-checking the tower arithmetic.
+class FQ2Poly(FQP):
+    degree = 2
+
     def __init__(self, coeffs):
         self.coeffs = [FQ(c) for c in coeffs]
         self.modulus_coeffs = [1, 0]
         self.degree = 2
-        self.__class__.degree = 2
 
-# The 12th-degree extension field
-class FQ12(FQP):
+class FQ12Poly(FQP):
+    degree = 12
+
     def __init__(self, coeffs):
         self.coeffs = [FQ(c) for c in coeffs]
         self.modulus_coeffs = FQ12_modulus_coeffs
         self.degree = 12
-        self.__class__.degree = 12
\ No newline at end of file
+
+# Tower representation of FQ12:
+# F_{q^2} = F_q[u] / (u^2 + 1)
+# F_{q^6} = F_{q^2}[v] / (v^3 - (u + 1))
+# F_{q^12} = F_{q^6}[w] / (w^2 - v)
+# FQ2 keeps its two coefficients as raw ints, FQ6 holds three FQ2 and FQ12
+# holds two FQ6. Multiplication uses Karatsuba at every level and squaring
+# has dedicated formulas, so no FQ wrappers are created in the hot path.
+
+def _fq2(c0, c1):
+    r = _new(FQ2)
+    r.c0 = c0 % _modulus
+    r.c1 = c1 % _modulus
+    return r
+
+def _fq6(c0, c1, c2):
+    r = _new(FQ6)
+    r.c0 = c0
+    r.c1 = c1
+    r.c2 = c2
+    return r
+
+def _fq12(c0, c1):
+    r = _new(FQ12)
+    r.c0 = c0
+    r.c1 = c1
+    return r
+
+# The quadratic extension field, a + b * u with u^2 = -1
+class FQ2():
+    __slots__ = ('c0', 'c1')
+    degree = 2
+    modulus_coeffs = [1, 0]
+
+    def __init__(self, coeffs):
+        assert len(coeffs) == 2
+        c0, c1 = coeffs
+        self.c0 = mpz(c0.n if isinstance(c0, FQ) else c0) % _modulus
+        self.c1 = mpz(c1.n if isinstance(c1, FQ) else c1) % _modulus
+
+    @property
+    def coeffs(self):
+        return [FQ(self.c0), FQ(self.c1)]
+
+    def __add__(self, other):
+        assert isinstance(other, FQ2)
+        return _fq2(self.c0 + other.c0, self.c1 + other.c1)
+
+    def __sub__(self, other):
+        assert isinstance(other, FQ2)
+        return _fq2(self.c0 - other.c0, self.c1 - other.c1)
+
+    def __neg__(self):
+        return _fq2(-self.c0, -self.c1)
+
+    def __mul__(self, other):
+        if isinstance(other, FQ2):
+            a0, a1, b0, b1 = self.c0, self.c1, other.c0, other.c1
+            t0, t1 = a0 * b0, a1 * b1
+            return _fq2(t0 - t1, (a0 + a1) * (b0 + b1) - t0 - t1)
+        if isinstance(other, (FQ,) + int_types):
+            on = _scalar(other)
+            return _fq2(self.c0 * on, self.c1 * on)
+        return NotImplemented
+
+    def __rmul__(self, other):
+        return self * other
+
+    def square(self):
+        a0, a1 = self.c0, self.c1
+        return _fq2((a0 + a1) * (a0 - a1), 2 * a0 * a1)
+
+    # Multiply by the cubic non-residue u + 1 used to build FQ6
+    def mul_by_nonresidue(self):
+        return _fq2(self.c0 - self.c1, self.c0 + self.c1)
+
+    def conjugate(self):
+        return _fq2(self.c0, -self.c1)
+
+    # A square root of x, or None if x is not a square. Algorithm 9 of
+    # Adj and Rodriguez-Henriquez, "Square root computation over even
+    # extension fields", for q = 3 mod 4
+    def sqrt(self):
+        a1 = self ** _fq2_sqrt_exp
+        alpha = a1.square() * self
+        x0 = a1 * self
+        if alpha == -FQ2.one():
+            x = _fq2(-x0.c1, x0.c0)
+        else:
+            x = (alpha + FQ2.one()) ** _fq2_sqrt_exp_b * x0
+        return x if x.square() == self else None
+
+    # x^(q^k), u^q = -u
+    def frobenius(self, k=1):
+        return self.conjugate() if k % 2 else self
+
+    # 1 / (a + b * u) = (a - b * u) / (a^2 + b^2)
+    def inv(self):
+        a0, a1 = self.c0, self.c1
+        t = inv(a0 * a0 + a1 * a1, _modulus)
+        return _fq2(a0 * t, -a1 * t)
+
+    def __div__(self, other):
+        if isinstance(other, FQ2):
+            return self * other.inv()
+        return self * inv(_scalar(other), _modulus)
+
+    def __truediv__(self, other):
+        return self.__div__(other)
+
+    def __pow__(self, other):
+        if other < 0:
+            return self.inv() ** -other
+        result = FQ2.one()
+        for bit in bin(other)[2:]:
+            result = result.square()
+            if bit == '1':
+                result = result * self
+        return result
+
+    def __eq__(self, other):
+        if not isinstance(other, FQ2):
+            return False
+        return self.c0 == other.c0 and self.c1 == other.c1
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return repr([int(self.c0), int(self.c1)])
+
+    @classmethod
+    def one(cls):
+        return _fq2(1, 0)
+
+    @classmethod
+    def zero(cls):
+        return _fq2(0, 0)
+
+# Frobenius coefficients: (w^i)^(q^j) = frobenius_coeffs()[j][i] * w^i with
+# frobenius_coeffs()[j][i] = (u + 1)^(i * (q^j - 1) / 6). The table is computed
+# on first use and cached on disk in FROBENIUS_CACHE_FILE; a cache that is
+# malformed or fails the checks is computed again.
+FROBENIUS_CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'build', 'frobenius_coeffs.json')
+# Bump when the layout of the cache file changes
+FROBENIUS_FORMAT_VERSION = 1
+_frobenius_coeffs = None
+
+def _compute_frobenius_coeffs():
+    xi = FQ2([1, 1])
+    table = []
+    for j in range(12):
+        gamma = xi ** ((field_modulus ** j - 1) // 6 % (field_modulus ** 2 - 1))
+        row = [FQ2.one()]
+        for i in range(5):
+            row.append(row[-1] * gamma)
+        table.append(row)
+    return table
+
+def _is_fq2_pair(c):
+    return isinstance(c, list) and len(c) == 2 and all(type(x) is int and 0 <= x < field_modulus for x in c)
+
+def _load_frobenius_coeffs(path):
+    try:
+        with open(path, 'r') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(cached, dict) or cached.get('format') != FROBENIUS_FORMAT_VERSION or \
+            cached.get('field_modulus') != field_modulus:
+        return None
+    coeffs = cached.get('coeffs')
+    if not isinstance(coeffs, list) or len(coeffs) != 12 or \
+            not all(isinstance(row, list) and len(row) == 6 and all(map(_is_fq2_pair, row)) for row in coeffs):
+        return None
+    table = [[FQ2(c) for c in row] for row in coeffs]
+    # Spot check the first power of the first Frobenius
+    if table[1][1] != FQ2([1, 1]) ** ((field_modulus - 1) // 6):
+        return None
+    return table
+
+def _save_frobenius_coeffs(path, table):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump({'format': FROBENIUS_FORMAT_VERSION, 'field_modulus': field_modulus,
+                       'coeffs': [[[int(c.c0), int(c.c1)] for c in row] for row in table]}, f)
+    except OSError:
+        pass
+
+def frobenius_coeffs():
+    global _frobenius_coeffs
+    if _frobenius_coeffs is None:
+        table = _load_frobenius_coeffs(FROBENIUS_CACHE_FILE)
+        if table is None:
+            table = _compute_frobenius_coeffs()
+            _save_frobenius_coeffs(FROBENIUS_CACHE_FILE, table)
+        _frobenius_coeffs = table
+    return _frobenius_coeffs
+
+# The sextic extension field, c0 + c1 * v + c2 * v^2 with v^3 = u + 1
+class FQ6():
+    __slots__ = ('c0', 'c1', 'c2')
+    degree = 6
+
+    def __init__(self, coeffs):
+        assert len(coeffs) == 3
+        self.c0, self.c1, self.c2 = [c if isinstance(c, FQ2) else FQ2(c) for c in coeffs]
+
+    @property
+    def coeffs(self):
+        return [self.c0, self.c1, self.c2]
+
+    def __add__(self, other):
+        assert isinstance(other, FQ6)
+        return _fq6(self.c0 + other.c0, self.c1 + other.c1, self.c2 + other.c2)
+
+    def __sub__(self, other):
+        assert isinstance(other, FQ6)
+        return _fq6(self.c0 - other.c0, self.c1 - other.c1, self.c2 - other.c2)
+
+    def __neg__(self):
+        return _fq6(-self.c0, -self.c1, -self.c2)
+
+    # Karatsuba over FQ2, with the FQ2 products inlined on raw ints and a
+    # single reduction per output coefficient
+    def __mul__(self, other):
+        if isinstance(other, FQ6):
+            a0r, a0i = self.c0.c0, self.c0.c1
+            a1r, a1i = self.c1.c0, self.c1.c1
+            a2r, a2i = self.c2.c0, self.c2.c1
+            b0r, b0i = other.c0.c0, other.c0.c1
+            b1r, b1i = other.c1.c0, other.c1.c1
+            b2r, b2i = other.c2.c0, other.c2.c1
+            # t_j = a_j * b_j
+            m0, m1 = a0r * b0r, a0i * b0i
+            t0r, t0i = m0 - m1, (a0r + a0i) * (b0r + b0i) - m0 - m1
+            m0, m1 = a1r * b1r, a1i * b1i
+            t1r, t1i = m0 - m1, (a1r + a1i) * (b1r + b1i) - m0 - m1
+            m0, m1 = a2r * b2r, a2i * b2i
+            t2r, t2i = m0 - m1, (a2r + a2i) * (b2r + b2i) - m0 - m1
+            # c0 = t0 + (u + 1) * ((a1 + a2)(b1 + b2) - t1 - t2)
+            xr, xi, yr, yi = a1r + a2r, a1i + a2i, b1r + b2r, b1i + b2i
+            m0, m1 = xr * yr, xi * yi
+            sr, si = m0 - m1 - t1r - t2r, (xr + xi) * (yr + yi) - m0 - m1 - t1i - t2i
+            c0 = _fq2(t0r + sr - si, t0i + sr + si)
+            # c1 = (a0 + a1)(b0 + b1) - t0 - t1 + (u + 1) * t2
+            xr, xi, yr, yi = a0r + a1r, a0i + a1i, b0r + b1r, b0i + b1i
+            m0, m1 = xr * yr, xi * yi
+            c1 = _fq2(m0 - m1 - t0r - t1r + t2r - t2i,
+                      (xr + xi) * (yr + yi) - m0 - m1 - t0i - t1i + t2r + t2i)
+            # c2 = (a0 + a2)(b0 + b2) - t0 - t2 + t1
+            xr, xi, yr, yi = a0r + a2r, a0i + a2i, b0r + b2r, b0i + b2i
+            m0, m1 = xr * yr, xi * yi
+            c2 = _fq2(m0 - m1 - t0r - t2r + t1r,
+                      (xr + xi) * (yr + yi) - m0 - m1 - t0i - t2i + t1i)
+            return _fq6(c0, c1, c2)
+        if isinstance(other, (FQ2, FQ) + int_types):
+            return _fq6(self.c0 * other, self.c1 * other, self.c2 * other)
+        return NotImplemented
+
+    def __rmul__(self, other):
+        return self * other
+
+    # Chung-Hasan SQR2, with the FQ2 arithmetic inlined as in __mul__
+    def square(self):
+        a0r, a0i = self.c0.c0, self.c0.c1
+        a1r, a1i = self.c1.c0, self.c1.c1
+        a2r, a2i = self.c2.c0, self.c2.c1
+        # s0 = a0^2, s1 = 2 a0 a1, s2 = (a0 - a1 + a2)^2, s3 = 2 a1 a2, s4 = a2^2
+        s0r, s0i = (a0r + a0i) * (a0r - a0i), 2 * a0r * a0i
+        s1r, s1i = 2 * (a0r * a1r - a0i * a1i), 2 * (a0r * a1i + a0i * a1r)
+        xr, xi = a0r - a1r + a2r, a0i - a1i + a2i
+        s2r, s2i = (xr + xi) * (xr - xi), 2 * xr * xi
+        s3r, s3i = 2 * (a1r * a2r - a1i * a2i), 2 * (a1r * a2i + a1i * a2r)
+        s4r, s4i = (a2r + a2i) * (a2r - a2i), 2 * a2r * a2i
+        return _fq6(_fq2(s0r + s3r - s3i, s0i + s3r + s3i),
+                    _fq2(s1r + s4r - s4i, s1i + s4r + s4i),
+                    _fq2(s1r + s2r + s3r - s0r - s4r, s1i + s2i + s3i - s0i - s4i))
+
+    def __pow__(self, other):
+        if other < 0:
+            return self.inv() ** -other
+        result = FQ6.one()
+        for bit in bin(other)[2:]:
+            result = result.square()
+            if bit == '1':
+                result = result * self
+        return result
+
+    # Multiply by b0 + b1 * v
+    def mul_by_01(self, b0, b1):
+        a0, a1, a2 = self.c0, self.c1, self.c2
+        t0, t1 = a0 * b0, a1 * b1
+        return _fq6(((a1 + a2) * b1 - t1).mul_by_nonresidue() + t0,
+                    (a0 + a1) * (b0 + b1) - t0 - t1,
+                    (a0 + a2) * b0 - t0 + t1)
+
+    # Multiply by b1 * v
+    def mul_by_1(self, b1):
+        return _fq6((self.c2 * b1).mul_by_nonresidue(), self.c0 * b1, self.c1 * b1)
+
+    # Multiply by v, the quadratic non-residue used to build FQ12
+    def mul_by_nonresidue(self):
+        return _fq6(self.c2.mul_by_nonresidue(), self.c0, self.c1)
+
+    # The inverse is the adjugate divided by the norm to FQ2
+    def inv(self):
+        a0, a1, a2 = self.c0, self.c1, self.c2
+        t0 = a0.square() - (a1 * a2).mul_by_nonresidue()
+        t1 = a2.square().mul_by_nonresidue() - a0 * a1
+        t2 = a1.square() - a0 * a2
+        t = (a0 * t0 + (a2 * t1 + a1 * t2).mul_by_nonresidue()).inv()
+        return _fq6(t0 * t, t1 * t, t2 * t)
+
+    def __div__(self, other):
+        if isinstance(other, (FQ6, FQ2)):
+            return self * other.inv()
+        return self * inv(_scalar(other), _modulus)
+
+    def __truediv__(self, other):
+        return self.__div__(other)
+
+    # x^(q^k), using v = w^2 and v^2 = w^4
+    def frobenius(self, k=1):
+        gamma = frobenius_coeffs()[k % 12]
+        return _fq6(self.c0.frobenius(k),
+                    self.c1.frobenius(k) * gamma[2],
+                    self.c2.frobenius(k) * gamma[4])
+
+    def __eq__(self, other):
+        if not isinstance(other, FQ6):
+            return False
+        return self.c0 == other.c0 and self.c1 == other.c1 and self.c2 == other.c2
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return repr([self.c0, self.c1, self.c2])
+
+    @classmethod
+    def one(cls):
+        return _fq6(FQ2.one(), FQ2.zero(), FQ2.zero())
+
+    @classmethod
+    def zero(cls):
+        return _fq6(FQ2.zero(), FQ2.zero(), FQ2.zero())
+
+# Square of a + b * s in F_{q^4} = F_{q^2}[s] / (s^2 - (u + 1))
+def _fq4_square(a, b):
+    t0, t1 = a.square(), b.square()
+    return t1.mul_by_nonresidue() + t0, (a + b).square() - t0 - t1
+
+# The 12th-degree extension field, c0 + c1 * w with w^2 = v.
+# It is constructed from, and exposes as .coeffs, the flat representation
+# F_q[w] / (w^12 - 2w^6 + 2) used by the rest of the library.
+class FQ12():
+    __slots__ = ('c0', 'c1')
+    degree = 12
+    modulus_coeffs = FQ12_modulus_coeffs
+
+    def __init__(self, coeffs):
+        assert len(coeffs) == 12
+        f = [c.n if isinstance(c, FQ) else c for c in coeffs]
+        # w^6 = u + 1, so f[i] * w^i + f[i+6] * w^(i+6) = (f[i] + f[i+6] + f[i+6] * u) * w^i
+        a = [_fq2(f[i] + f[i+6], f[i+6]) for i in range(6)]
+        self.c0 = _fq6(a[0], a[2], a[4])
+        self.c1 = _fq6(a[1], a[3], a[5])
+
+    # FQ2 coefficients of 1, w, ..., w^5, i.e. the F_q^12 = F_q^2[w] / (w^6 - (u+1))
+    # layout used by the circom registers
+    def to_fq2_coeffs(self):
+        c0, c1 = self.c0, self.c1
+        return [c0.c0, c1.c0, c0.c1, c1.c1, c0.c2, c1.c2]
+
+    @classmethod
+    def from_fq2_coeffs(cls, a):
+        assert len(a) == 6
+        return _fq12(_fq6(a[0], a[2], a[4]), _fq6(a[1], a[3], a[5]))
+
+    @property
+    def coeffs(self):
+        a = self.to_fq2_coeffs()
+        return [FQ(x.c0 - x.c1) for x in a] + [FQ(x.c1) for x in a]
+
+    def __add__(self, other):
+        assert isinstance(other, FQ12)
+        return _fq12(self.c0 + other.c0, self.c1 + other.c1)
+
+    def __sub__(self, other):
+        assert isinstance(other, FQ12)
+        return _fq12(self.c0 - other.c0, self.c1 - other.c1)
+
+    def __neg__(self):
+        return _fq12(-self.c0, -self.c1)
+
+    def __mul__(self, other):
+        if isinstance(other, FQ12):
+            a0, a1, b0, b1 = self.c0, self.c1, other.c0, other.c1
+            t0, t1 = a0 * b0, a1 * b1
+            return _fq12(t1.mul_by_nonresidue() + t0, (a0 + a1) * (b0 + b1) - t0 - t1)
+        if isinstance(other, (FQ,) + int_types):
+            return _fq12(self.c0 * other, self.c1 * other)
+        return NotImplemented
+
+    def __rmul__(self, other):
+        return self * other
+
+    # Complex squaring
+    def square(self):
+        a0, a1 = self.c0, self.c1
+        ab = a0 * a1
+        c0 = (a0 + a1) * (a0 + a1.mul_by_nonresidue()) - ab - ab.mul_by_nonresidue()
+        return _fq12(c0, ab + ab)
+
+    # Multiply by the sparse element c0 + c1 * v + c4 * v * w, the shape of
+    # the Miller loop line functions
+    def mul_by_014(self, c0, c1, c4):
+        a0, a1 = self.c0, self.c1
+        t0 = a0.mul_by_01(c0, c1)
+        t1 = a1.mul_by_1(c4)
+        return _fq12(t1.mul_by_nonresidue() + t0,
+                     (a0 + a1).mul_by_01(c0, c1 + c4) - t0 - t1)
+
+    def is_one(self):
+        return self.c1 == FQ6.zero() and self.c0 == FQ6.one()
+
+    # f^(q^6), which is also the inverse of f in the cyclotomic subgroup
+    def conjugate(self):
+        return _fq12(self.c0, -self.c1)
+
+    # f^(q^k)
+    def frobenius(self, k=1):
+        gamma = frobenius_coeffs()[k % 12]
+        return _fq12(self.c0.frobenius(k), self.c1.frobenius(k) * gamma[1])
+
+    # Granger-Scott squaring, only valid for elements of the cyclotomic
+    # subgroup, i.e. after the easy part of the final exponentiation
+    def cyclotomic_square(self):
+        z0, z4, z3 = self.c0.c0, self.c0.c1, self.c0.c2
+        z2, z1, z5 = self.c1.c0, self.c1.c1, self.c1.c2
+        t0, t1 = _fq4_square(z0, z1)
+        z0 = t0 - z0
+        z0 = z0 + z0 + t0
+        z1 = t1 + z1
+        z1 = z1 + z1 + t1
+        t0, t1 = _fq4_square(z2, z3)
+        t2, t3 = _fq4_square(z4, z5)
+        z4 = t0 - z4
+        z4 = z4 + z4 + t0
+        z5 = t1 + z5
+        z5 = z5 + z5 + t1
+        t0 = t3.mul_by_nonresidue()
+        z2 = t0 + z2
+        z2 = z2 + z2 + t0
+        z3 = t2 - z3
+        z3 = z3 + z3 + t2
+        return _fq12(_fq6(z0, z4, z3), _fq6(z2, z1, z5))
+
+    def cyclotomic_exp(self, other):
+        result = FQ12.one()
+        for bit in bin(other)[2:]:
+            result = result.cyclotomic_square()
+            if bit == '1':
+                result = result * self
+        return result
+
+    # 1 / (a0 + a1 * w) = (a0 - a1 * w) / (a0^2 - v * a1^2)
+    def inv(self):
+        a0, a1 = self.c0, self.c1
+        t = (a0.square() - a1.square().mul_by_nonresidue()).inv()
+        return _fq12(a0 * t, -(a1 * t))
+
+    def __div__(self, other):
+        if isinstance(other, FQ12):
+            return self * other.inv()
+        return self * inv(_scalar(other), _modulus)
+
+    def __truediv__(self, other):
+        return self.__div__(other)
+
+    def __pow__(self, other):
+        if other < 0:
+            return self.inv() ** -other
+        result = FQ12.one()
+        for bit in bin(other)[2:]:
+            result = result.square()
+            if bit == '1':
+                result = result * self
+        return result
+
+    def __eq__(self, other):
+        if not isinstance(other, FQ12):
+            return False
+        return self.c0 == other.c0 and self.c1 == other.c1
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return repr(self.coeffs)
+
+    @classmethod
+    def one(cls):
+        return _fq12(FQ6.one(), FQ6.zero())
+
+    @classmethod
+    def zero(cls):
+        return _fq12(FQ6.zero(), FQ6.zero())
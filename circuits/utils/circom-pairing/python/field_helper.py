@@ -1,4 +1,4 @@
-from curve_field_elements import field_modulus, FQ, FQ2, FQ12, inv
+from curve_field_elements import field_modulus, FQ, FQ2, FQ12, inv, frobenius_coeffs
 
 def numberToBase(num, b):
     num = abs(num)
@@ -96,9 +96,12 @@ def printFQ12(X, n, k, xi=1):
     print("]")
 
 def print_fq12_frobenius_coeff(q, n, k, xi=1):
-    gamma = [[0]*6]*12
-    for j in range(12):
-        gamma[j] = [ FQ2([xi,1]) ** ( (i*(q**j-1)//6) % (q**2-1) ) for i in range(6)]
+    if q == field_modulus and xi == 1:
+        gamma = frobenius_coeffs()
+    else:
+        gamma = [[0]*6]*12
+        for j in range(12):
+            gamma[j] = [ FQ2([xi,1]) ** ( (i*(q**j-1)//6) % (q**2-1) ) for i in range(6)]
     for j in range(12):
         for i in range(6):
             A, B = gamma[j][i].coeffs
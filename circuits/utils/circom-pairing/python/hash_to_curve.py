@@ -0,0 +1,151 @@
+'''
+Hashing to G2 following the BLS12381G2_XMD:SHA-256_SSWU_RO_ suite of RFC 9380:
+expand_message_xmd with SHA-256, simplified SWU onto the curve E2' isogenous to
+the twisted curve, the 3-isogeny back to E2 and cofactor clearing with the psi
+endomorphism (Budroni-Pintore).
+'''
+
+import hashlib
+
+from curve_field_elements import field_modulus, FQ2, batch_inv
+from curve import b2, is_on_curve, add, multiply, neg, psi, bls12_381_x
+
+# Domain separation tag of Ethereum consensus signatures (proof of possession)
+DST_G2_POP = b'BLS_SIG_BLS12381G2_XMD:SHA-256_SSWU_RO_POP_'
+
+# Bytes per field element drawn by hash_to_field, ceil((381 + 128) / 8)
+L = 64
+
+# E2': y**2 = x**3 + ISO_A * x + ISO_B, and the SWU non-square Z
+ISO_A = FQ2([0, 240])
+ISO_B = FQ2([1012, 1012])
+SSWU_Z = FQ2([-2, -1])
+
+# Coefficients of the 3-isogeny E2' -> E2, lowest degree first. The
+# denominators are monic.
+ISO_X_NUM = [FQ2(c) for c in [
+    [0x5c759507e8e333ebb5b7a9a47d7ed8532c52d39fd3a042a88b58423c50ae15d5c2638e343d9c71c6238aaaaaaaa97d6,
+     0x5c759507e8e333ebb5b7a9a47d7ed8532c52d39fd3a042a88b58423c50ae15d5c2638e343d9c71c6238aaaaaaaa97d6],
+    [0,
+     0x11560bf17baa99bc32126fced787c88f984f87adf7ae0c7f9a208c6b4f20a4181472aaa9cb8d555526a9ffffffffc71a],
+    [0x11560bf17baa99bc32126fced787c88f984f87adf7ae0c7f9a208c6b4f20a4181472aaa9cb8d555526a9ffffffffc71e,
+     0x8ab05f8bdd54cde190937e76bc3e447cc27c3d6fbd7063fcd104635a790520c0a395554e5c6aaaa9354ffffffffe38d],
+    [0x171d6541fa38ccfaed6dea691f5fb614cb14b4e7f4e810aa22d6108f142b85757098e38d0f671c7188e2aaaaaaaa5ed1,
+     0],
+]]
+ISO_X_DEN = [FQ2(c) for c in [
+    [0,
+     0x1a0111ea397fe69a4b1ba7b6434bacd764774b84f38512bf6730d2a0f6b0f6241eabfffeb153ffffb9feffffffffaa63],
+    [0xc,
+     0x1a0111ea397fe69a4b1ba7b6434bacd764774b84f38512bf6730d2a0f6b0f6241eabfffeb153ffffb9feffffffffaa9f],
+    [1, 0],
+]]
+ISO_Y_NUM = [FQ2(c) for c in [
+    [0x1530477c7ab4113b59a4c18b076d11930f7da5d4a07f649bf54439d87d27e500fc8c25ebf8c92f6812cfc71c71c6d706,
+     0x1530477c7ab4113b59a4c18b076d11930f7da5d4a07f649bf54439d87d27e500fc8c25ebf8c92f6812cfc71c71c6d706],
+    [0,
+     0x5c759507e8e333ebb5b7a9a47d7ed8532c52d39fd3a042a88b58423c50ae15d5c2638e343d9c71c6238aaaaaaaa97be],
+    [0x11560bf17baa99bc32126fced787c88f984f87adf7ae0c7f9a208c6b4f20a4181472aaa9cb8d555526a9ffffffffc71c,
+     0x8ab05f8bdd54cde190937e76bc3e447cc27c3d6fbd7063fcd104635a790520c0a395554e5c6aaaa9354ffffffffe38f],
+    [0x124c9ad43b6cf79bfbf7043de3811ad0761b0f37a1e26286b0e977c69aa274524e79097a56dc4bd9e1b371c71c718b10,
+     0],
+]]
+ISO_Y_DEN = [FQ2(c) for c in [
+    [0x1a0111ea397fe69a4b1ba7b6434bacd764774b84f38512bf6730d2a0f6b0f6241eabfffeb153ffffb9feffffffffa8fb,
+     0x1a0111ea397fe69a4b1ba7b6434bacd764774b84f38512bf6730d2a0f6b0f6241eabfffeb153ffffb9feffffffffa8fb],
+    [0,
+     0x1a0111ea397fe69a4b1ba7b6434bacd764774b84f38512bf6730d2a0f6b0f6241eabfffeb153ffffb9feffffffffa9d3],
+    [0x12,
+     0x1a0111ea397fe69a4b1ba7b6434bacd764774b84f38512bf6730d2a0f6b0f6241eabfffeb153ffffb9feffffffffaa99],
+    [1, 0],
+]]
+
+def _as_bytes(s):
+    return s.encode() if isinstance(s, str) else bytes(s)
+
+def expand_message_xmd(msg, dst, len_in_bytes):
+    msg, dst = _as_bytes(msg), _as_bytes(dst)
+    if len(dst) > 255:
+        dst = hashlib.sha256(b'H2C-OVERSIZE-DST-' + dst).digest()
+    ell = (len_in_bytes + 31) // 32
+    if ell > 255 or len_in_bytes > 65535:
+        raise ValueError('expand_message_xmd: requested too many bytes')
+    dst_prime = dst + bytes([len(dst)])
+    b_0 = hashlib.sha256(bytes(64) + msg + len_in_bytes.to_bytes(2, 'big') + b'\x00' + dst_prime).digest()
+    b_i = hashlib.sha256(b_0 + b'\x01' + dst_prime).digest()
+    out = [b_i]
+    for i in range(2, ell + 1):
+        b_i = hashlib.sha256(bytes(x ^ y for x, y in zip(b_0, b_i)) + bytes([i]) + dst_prime).digest()
+        out.append(b_i)
+    return b''.join(out)[:len_in_bytes]
+
+def hash_to_field_fq2(msg, count, dst):
+    data = expand_message_xmd(msg, dst, count * 2 * L)
+    out = []
+    for i in range(count):
+        e = [int.from_bytes(data[L * (2 * i + j): L * (2 * i + j + 1)], 'big') % field_modulus
+             for j in range(2)]
+        out.append(FQ2(e))
+    return out
+
+# Sign of an element of FQ2 as defined by RFC 9380
+def sgn0(x):
+    sign_0 = x.c0 % 2
+    zero_0 = x.c0 == 0
+    return sign_0 or (zero_0 and x.c1 % 2)
+
+# Simplified SWU map onto E2'
+def map_to_curve_sswu(u):
+    tv1 = SSWU_Z * u.square()
+    tv2 = tv1.square() + tv1
+    if tv2 == FQ2.zero():
+        # Exceptional case, x1 = B / (Z * A)
+        x1 = ISO_B / (SSWU_Z * ISO_A)
+    else:
+        x1 = -ISO_B / ISO_A * (FQ2.one() + tv2.inv())
+    gx1 = (x1.square() + ISO_A) * x1 + ISO_B
+    y = gx1.sqrt()
+    if y is not None:
+        x = x1
+    else:
+        x = tv1 * x1
+        y = ((x.square() + ISO_A) * x + ISO_B).sqrt()
+    if sgn0(u) != sgn0(y):
+        y = -y
+    return (x, y)
+
+def _horner(coeffs, x):
+    acc = coeffs[-1]
+    for c in reversed(coeffs[:-1]):
+        acc = acc * x + c
+    return acc
+
+# 3-isogeny E2' -> E2, both denominators share one inversion
+def iso_map(pt):
+    x, y = pt
+    x_den, y_den = _horner(ISO_X_DEN, x), _horner(ISO_Y_DEN, x)
+    if x_den == FQ2.zero() or y_den == FQ2.zero():
+        return None
+    x_den_inv, y_den_inv = batch_inv([x_den, y_den])
+    return (_horner(ISO_X_NUM, x) * x_den_inv, y * _horner(ISO_Y_NUM, x) * y_den_inv)
+
+# [x**2 - x - 1]P + [x - 1]psi(P) + psi(psi(2P)), equal to [h_eff]P
+def clear_cofactor(pt):
+    t1 = multiply(pt, bls12_381_x)
+    t2 = psi(pt)
+    t3 = psi(psi(add(pt, pt)))
+    t3 = add(t3, neg(t2))
+    t2 = add(t1, t2)
+    t2 = multiply(t2, bls12_381_x)
+    t3 = add(t3, t2)
+    t3 = add(t3, neg(t1))
+    return add(t3, neg(pt))
+
+def hash_to_g2(msg, dst=DST_G2_POP):
+    u0, u1 = hash_to_field_fq2(msg, 2, dst)
+    # E2' has a != 0, so both points are mapped to E2 before the addition
+    q0 = iso_map(map_to_curve_sswu(u0))
+    q1 = iso_map(map_to_curve_sswu(u1))
+    pt = clear_cofactor(add(q0, q1))
+    assert is_on_curve(pt, b2)
+    return pt
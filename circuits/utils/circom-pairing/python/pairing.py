@@ -1,7 +1,9 @@
-from curve import double, add, neg, multiply, is_on_curve, twist, b, b2, curve_order, G1
+import curve
+from curve import double, add, neg, multiply, is_on_curve, to_jacobian, b, b2, curve_order, G1, bls12_381_x
 from curve_field_elements import field_modulus, FQ, FQ12
 
-ate_loop_count = 15132376222941642752
+# The BLS12-381 parameter x is negative, ate_loop_count = |x|
+ate_loop_count = -bls12_381_x
 log_ate_loop_count = 62
 
 # Create a function representing the line between P1 and P2,
@@ -24,21 +26,6 @@ def cast_point_to_fq12(pt):
     x, y = pt
     return (FQ12([x.n] + [0] * 11), FQ12([y.n] + [0] * 11))
 
-# Check consistency of the "line function"
-one, two, three = G1, double(G1), multiply(G1, 3)
-negone, negtwo, negthree = multiply(G1, curve_order - 1), multiply(G1, curve_order - 2), multiply(G1, curve_order - 3)
-
-assert linefunc(one, two, one) == FQ(0)
-assert linefunc(one, two, two) == FQ(0)
-assert linefunc(one, two, three) != FQ(0)
-assert linefunc(one, two, negthree) == FQ(0)
-assert linefunc(one, negone, one) == FQ(0)
-assert linefunc(one, negone, negone) == FQ(0)
-assert linefunc(one, negone, two) != FQ(0)
-assert linefunc(one, one, one) == FQ(0)
-assert linefunc(one, one, two) != FQ(0)
-assert linefunc(one, one, negtwo) == FQ(0)
-
 # Main miller loop
 def miller_loop(Q, P):
     if Q is None or P is None:
@@ -62,11 +49,150 @@ def miller_loop(Q, P):
     # R = add(R, nQ2) This line is in many specifications but it technically does nothing
     return f ** ((field_modulus ** 12 - 1) // curve_order)
 
+# Line functions for the Miller loop over the twist. R is a Jacobian point
+# in E'(FQ2), P = (xp, yp) an affine point in E(FQ). With R = (x, y) in affine
+# twist coordinates and slope l, the line through R evaluated at twist(P),
+# scaled by w**3, is
+#   yp * w**3 - l * xp * w**2 + (l * x - y)
+# and these return it, up to an FQ2 factor, as the coefficients (c0, c1, c4)
+# for FQ12.mul_by_014 along with the new R.
+def double_line(R, P):
+    X, Y, Z = R
+    xp, yp = P
+    A = X.square()
+    B = Y.square()
+    C = B.square()
+    D = (X + B).square() - A - C
+    D = D + D
+    E = A + A + A
+    ZZ = Z.square()
+    X3 = E.square() - D - D
+    Y3 = E * (D - X3) - C * 8
+    Z3 = (Y + Y) * Z
+    return (X3, Y3, Z3), (E * X - B - B, -(E * ZZ) * xp, Z3 * ZZ * yp)
+
+# Q is an affine point in E'(FQ2), R + Q uses mixed addition
+def add_line(R, Q, P):
+    X1, Y1, Z1 = R
+    x2, y2 = Q
+    xp, yp = P
+    Z1Z1 = Z1.square()
+    H = x2 * Z1Z1 - X1
+    HH = H.square()
+    I = HH * 4
+    J = H * I
+    r = (y2 * Z1 * Z1Z1 - Y1) * 2
+    V = X1 * I
+    X3 = r.square() - J - V - V
+    Y3 = r * (V - X3) - Y1 * J * 2
+    Z3 = (Z1 + H).square() - Z1Z1 - HH
+    return (X3, Y3, Z3), (r * x2 - Z3 * y2, -r * xp, Z3 * yp)
+
+# Miller loop with R kept on the FQ2 twist and sparse line multiplication.
+# Q is in E'(FQ2), P in E(FQ). Returns f before the final exponentiation;
+# after it the result equals that of miller_loop(twist(Q), cast_point_to_fq12(P)).
+def miller_loop_fp2(Q, P):
+    return multi_miller_loop([(Q, P)])
+
+# Product of the Miller loops of several (Q, P) pairs, sharing the
+# squarings of f across all pairs
+def multi_miller_loop(pairs):
+    pairs = [(neg(Q), P) for Q, P in pairs if Q is not None and P is not None]
+    Rs = [to_jacobian(nQ) for nQ, P in pairs]
+    f = FQ12.one()
+    for i in range(log_ate_loop_count, -1, -1):
+        f = f.square()
+        for j, (nQ, P) in enumerate(pairs):
+            Rs[j], (c0, c1, c4) = double_line(Rs[j], P)
+            f = f.mul_by_014(c0, c1, c4)
+        if ate_loop_count & (2**i):
+            for j, (nQ, P) in enumerate(pairs):
+                Rs[j], (c0, c1, c4) = add_line(Rs[j], nQ, P)
+                f = f.mul_by_014(c0, c1, c4)
+    return f
+
+# Line functions of MillerLoopFp2 in circuits/pairing.circom, exactly as the
+# circuit evaluates them on affine points: R, R1, R2 in E'(FQ2) and
+# P = (xp, yp) in E(FQ), as FQ12 elements with FQ2 coefficients of w**i.
+# LineFunctionEqualFp2 is (3x^3 - 2y^2) + w^2 (-3 x^2 xp) + w^3 (2 y yp)
+def line_equal_fp2(R, P):
+    x, y = R
+    xp, yp = P
+    x_sq3 = x.square() * 3
+    zero = x.zero()
+    return FQ12.from_fq2_coeffs([x_sq3 * x - y.square() * 2, zero, -(x_sq3 * xp), y * 2 * yp, zero, zero])
+
+# LineFunctionUnequalFp2 is w (x1 y2 - x2 y1) + w^3 (y1 - y2) xp + w^4 (x2 - x1) yp
+def line_unequal_fp2(R1, R2, P):
+    (x1, y1), (x2, y2) = R1, R2
+    xp, yp = P
+    zero = x1.zero()
+    return FQ12.from_fq2_coeffs([zero, x1 * y2 - x2 * y1, zero, (y1 - y2) * xp, (x2 - x1) * yp, zero])
+
+# Affine Miller loop of MillerLoopFp2 on Q in E'(FQ2) and P in E(FQ), with
+# the circuit's line functions, so that f is the circuit's out and not only
+# equal to it after the final exponentiation. Returns (f, [ate_loop_count]Q).
+# OptimalAtePairing runs it on -Q: final_exponentiate(f) == pairing(neg(Q), P)
+def miller_loop_affine(Q, P):
+    R = Q
+    f = FQ12.one()
+    for i in range(log_ate_loop_count, -1, -1):
+        f = f.square() * line_equal_fp2(R, P)
+        R = double(R)
+        if ate_loop_count & (2**i):
+            f = f * line_unequal_fp2(R, Q, P)
+            R = add(R, Q)
+    return f, R
+
 # Pairing computation
 def pairing(Q, P):
     assert is_on_curve(Q, b2)
     assert is_on_curve(P, b)
-    return miller_loop(twist(Q), cast_point_to_fq12(P))
+    return final_exponentiate(miller_loop_fp2(Q, P))
+
+# Product of pairings e(Q1, P1) * e(Q2, P2) * ... with a single final
+# exponentiation
+def multi_pairing(pairs):
+    for Q, P in pairs:
+        assert is_on_curve(Q, b2)
+        assert is_on_curve(P, b)
+    return final_exponentiate(multi_miller_loop(pairs))
+
+# Check that a product of pairings is one, e.g. BLS verification
+# e(pk, H(m)) * e(-G1, sig) == 1 as multi_pairing_is_one([(H(m), pk), (sig, neg(G1))])
+def multi_pairing_is_one(pairs):
+    return multi_pairing(pairs).is_one()
+
+# Final exponentiation f^((q^12 - 1) / r), split into the easy part
+# (q^6 - 1)(q^2 + 1) computed with conjugation and Frobenius, and the hard
+# part (q^4 - q^2 + 1) / r = (x - 1)^2 / 3 * (x + q) * (x^2 + q^2 - 1) + 1,
+# computed with exponentiations by x in the cyclotomic subgroup
+def final_exponentiate(f):
+    f = f.conjugate() / f
+    f = f.frobenius(2) * f
+    a = f.cyclotomic_exp((bls12_381_x - 1) ** 2 // 3)
+    b = a.cyclotomic_exp(ate_loop_count).conjugate() * a.frobenius(1)
+    c = b.cyclotomic_exp(ate_loop_count).cyclotomic_exp(ate_loop_count) * b.frobenius(2) * b.conjugate()
+    return c * f
+
+# Reference implementation as a single exponentiation
+def final_exponentiate_naive(p):
+    return p ** ((field_modulus ** 12 - 1) // curve_order)
+
+# Checks of the constants of curve.py and of the "line function", formerly run
+# at import time
+def self_test():
+    curve.self_test()
+    one, two, three = G1, double(G1), multiply(G1, 3)
+    negone, negtwo, negthree = multiply(G1, curve_order - 1), multiply(G1, curve_order - 2), multiply(G1, curve_order - 3)
 
-def final_exponentiate(p):
-    return p ** ((field_modulus ** 12 - 1) // curve_order)
\ No newline at end of file
+    assert linefunc(one, two, one) == FQ(0)
+    assert linefunc(one, two, two) == FQ(0)
+    assert linefunc(one, two, three) != FQ(0)
+    assert linefunc(one, two, negthree) == FQ(0)
+    assert linefunc(one, negone, one) == FQ(0)
+    assert linefunc(one, negone, negone) == FQ(0)
+    assert linefunc(one, negone, two) != FQ(0)
+    assert linefunc(one, one, one) == FQ(0)
+    assert linefunc(one, one, two) != FQ(0)
+    assert linefunc(one, one, negtwo) == FQ(0)
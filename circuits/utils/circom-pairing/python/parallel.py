@@ -0,0 +1,34 @@
+'''
+Process-pool helpers shared by the batch operations and the generators. With
+one worker, or a single task, everything runs in the calling process.
+'''
+
+import os
+
+# Lists of items are split in chunks of this many items per worker task; a
+# list that fits in one chunk is processed without a pool
+CHUNK_SIZE = 256
+
+# f(task) for every task, in order, spread over a pool of worker processes.
+# Results are yielded as they complete in order, so a caller can stream them
+# out while the later tasks are running.
+def pool_imap(f, tasks, workers=None):
+    tasks = list(tasks)
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers <= 1:
+        yield from map(f, tasks)
+        return
+    # concurrent.futures.process is slow to import, only load it when needed
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(f, tasks)
+
+def _map_chunk(args):
+    f, chunk = args
+    return [f(item) for item in chunk]
+
+# [f(item) for item in items], chunk_size items per worker task
+def pool_map(f, items, workers=None, chunk_size=CHUNK_SIZE):
+    items = list(items)
+    chunks = [(f, items[i:i + chunk_size]) for i in range(0, len(items), chunk_size)]
+    return [res for chunk in pool_imap(_map_chunk, chunks, workers) for res in chunk]
@@ -1,117 +1,354 @@
 import argparse
+import functools
 import json
+import mmap
+import os
 import pprint
+import re
+import sqlite3
+import struct
+import sys
+import time
+from contextlib import closing, contextmanager
 
-def parse_signal_arrays(sigs, debug=False):
+WTNS_MAGIC = b'wtns'
+
+# A binary .wtns witness as written by the circom witness generators, memory
+# mapped so that values are only decoded when accessed. The file is a list of
+# sections (type, size, data) after the magic, the version and the number of
+# sections; section 1 holds the field element size n8, the prime and the
+# number of values, section 2 the values as n8-byte little-endian integers.
+class WtnsFile():
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        try:
+            if os.fstat(self._file.fileno()).st_size < 12:
+                raise ValueError('%s is not a .wtns file' % path)
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except BaseException:
+            self._file.close()
+            raise
+        if self._mm[:4] != WTNS_MAGIC:
+            self.close()
+            raise ValueError('%s is not a .wtns file' % path)
+        self.version, n_sections = struct.unpack_from('<II', self._mm, 4)
+        sections = {}
+        pos = 12
+        for _ in range(n_sections):
+            section_type, size = struct.unpack_from('<IQ', self._mm, pos)
+            sections[section_type] = (pos + 12, size)
+            pos += 12 + size
+        if 1 not in sections or 2 not in sections:
+            self.close()
+            raise ValueError('%s has no header or witness section' % path)
+        header = sections[1][0]
+        self.n8 = struct.unpack_from('<I', self._mm, header)[0]
+        self.prime = int.from_bytes(self._mm[header + 4:header + 4 + self.n8], 'little')
+        self.n_witness = struct.unpack_from('<I', self._mm, header + 4 + self.n8)[0]
+        self._offset, size = sections[2]
+        if size != self.n_witness * self.n8:
+            self.close()
+            raise ValueError('%s: witness section of %d bytes for %d values' % (path, size, self.n_witness))
+
+    def __len__(self):
+        return self.n_witness
+
+    def __getitem__(self, idx):
+        if not 0 <= idx < self.n_witness:
+            raise IndexError('witness index %d out of range' % idx)
+        start = self._offset + idx * self.n8
+        return int.from_bytes(self._mm[start:start + self.n8], 'little')
+
+    # Values start to stop as their raw bytes
+    def raw(self, start, stop):
+        stop = min(stop, self.n_witness)
+        return self._mm[self._offset + start * self.n8:self._offset + stop * self.n8]
+
+    def __iter__(self):
+        for idx in range(self.n_witness):
+            yield self[idx]
+
+    def close(self):
+        if getattr(self, '_mm', None) is not None:
+            self._mm.close()
+            self._mm = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def write_wtns(path, values, prime):
+    n8 = (prime.bit_length() + 63) // 64 * 8
+    header = struct.pack('<I', n8) + prime.to_bytes(n8, 'little') + struct.pack('<I', len(values))
+    with open(path, 'wb') as f:
+        f.write(WTNS_MAGIC + struct.pack('<II', 2, 2))
+        f.write(struct.pack('<IQ', 1, len(header)) + header)
+        f.write(struct.pack('<IQ', 2, n8 * len(values)))
+        for v in values:
+            f.write(int(v).to_bytes(n8, 'little'))
+
+# A .wtns file, or a witness.json as written by snarkjs wej (read whole)
+@contextmanager
+def open_witness(path):
+    with open(path, 'rb') as f:
+        magic = f.read(4)
+    if magic == WTNS_MAGIC:
+        with WtnsFile(path) as witness:
+            yield witness
+    else:
+        with open(path, 'r') as f:
+            yield [int(v) for v in json.load(f)]
+
+# (signal name, witness index) for every line of a .sym file whose signal was
+# not optimized out. A line is "label index, witness index, component index,
+# name"; the witness index is -1 for removed signals.
+def iter_sym(path, removed=False):
+    for _, signal, witness_idx in _iter_sym_lines(path):
+        if removed or witness_idx != -1:
+            yield signal, witness_idx
+
+def _iter_sym_lines(path):
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            label, witness_idx, _, signal = line.split(',', 3)
+            yield int(label), signal, int(witness_idx)
+
+# (signal name, value) pairs, lazily
+def iter_signals(witness, sym_path):
+    for signal, witness_idx in iter_sym(sym_path):
+        yield signal, witness[witness_idx]
+
+# The .sig cache is a JSON list of [name, value], written while the signals
+# are streamed through
+def cache_signals(signals, path):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        f.write('[')
+        for i, (signal, value) in enumerate(signals):
+            f.write('%s[%s, %d]' % (',\n' if i else '', json.dumps(signal), value))
+            yield signal, value
+        f.write(']')
+    os.replace(tmp, path)
+
+def read_sig_cache(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+# Index of the signal names of a .sym file, as an SQLite database next to it.
+# It is built once per compiled circuit and rebuilt when the .sym file
+# changes; lookups by name or prefix then read a few pages of it and only
+# the requested values of the witness.
+INDEX_VERSION = 1
+INDEX_BATCH = 100000
+
+def _sym_stamp(sym_path):
+    st = os.stat(sym_path)
+    return '%d:%d:%d' % (INDEX_VERSION, st.st_size, st.st_mtime_ns)
+
+def _index_is_current(index_path, stamp):
+    if not os.path.exists(index_path):
+        return False
+    try:
+        with closing(sqlite3.connect(index_path)) as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'sym'").fetchone()
+    except sqlite3.DatabaseError:
+        return False
+    return row is not None and row[0] == stamp
+
+def build_index(sym_path, index_path=None, force=False):
+    index_path = index_path or sym_path + '.idx'
+    stamp = _sym_stamp(sym_path)
+    if not force and _index_is_current(index_path, stamp):
+        return index_path
+    tmp = index_path + '.tmp'
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    conn = sqlite3.connect(tmp)
+    try:
+        conn.execute('PRAGMA journal_mode = OFF')
+        conn.execute('PRAGMA synchronous = OFF')
+        conn.execute('CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)')
+        conn.execute('CREATE TABLE signals (name TEXT, label INTEGER, witness_idx INTEGER)')
+        lines = _iter_sym_lines(sym_path)
+        while True:
+            batch = [row for _, row in zip(range(INDEX_BATCH), lines)]
+            if not batch:
+                break
+            conn.executemany('INSERT INTO signals (label, name, witness_idx) VALUES (?, ?, ?)', batch)
+        # Indexing after the inserts is much faster than inserting into a
+        # sorted table
+        conn.execute('CREATE INDEX signals_name ON signals (name)')
+        conn.execute("INSERT INTO meta VALUES ('sym', ?)", (stamp,))
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp, index_path)
+    return index_path
+
+def open_index(sym_path, index_path=None):
+    return sqlite3.connect(build_index(sym_path, index_path))
+
+# Witness index of a signal, -1 if it was optimized out and None if there is
+# no such signal
+def index_get(conn, name):
+    row = conn.execute('SELECT witness_idx FROM signals WHERE name = ?', (name,)).fetchone()
+    return None if row is None else row[0]
+
+# (name, witness index) of the signals whose name starts with prefix, in the
+# order of the .sym file
+def index_prefix(conn, prefix, removed=False):
+    query = 'SELECT name, witness_idx FROM signals WHERE name >= ?'
+    params = [prefix]
+    if prefix:
+        # Names below the prefix with its last character incremented
+        query += ' AND name < ?'
+        params.append(prefix[:-1] + chr(ord(prefix[-1]) + 1))
+    if not removed:
+        query += ' AND witness_idx != -1'
+    return conn.execute(query + ' ORDER BY label', params)
+
+# Signal names are components joined by '.', each a name with any number of
+# array indices, as main.miller.f[3][1][0]
+_COMPONENT = re.compile(r'([^\[\]]+)((?:\[\d+\])*)')
+
+@functools.lru_cache(maxsize=1 << 16)
+def _parse_component(part):
+    m = _COMPONENT.fullmatch(part)
+    if m is None:
+        raise ValueError('cannot parse signal name component %r' % part)
+    return m.group(1), tuple(int(i) for i in m.group(2)[1:-1].split('][')) if m.group(2) else ()
+
+def in_subtree(name, prefix):
+    return not prefix or name == prefix or (name.startswith(prefix) and name[len(prefix)] in '.[')
+
+# The container and key of name[idxs] in the dict node. Arrays of any
+# dimension are lists, created and extended when an index is first seen;
+# missing entries are None.
+def _slot(node, name, idxs, signal):
+    if not idxs:
+        return node, name
+    container, key = node, name
+    for i in idxs:
+        arr = container[key] if isinstance(container, list) else container.get(key)
+        if arr is None:
+            arr = container[key] = []
+        elif not isinstance(arr, list):
+            raise ValueError('%s: %r is both an array and a signal or component' % (signal, name))
+        if len(arr) <= i:
+            arr.extend([None] * (i + 1 - len(arr)))
+        container, key = arr, i
+    return container, key
+
+def _child(node, part, signal):
+    container, key = _slot(node, *_parse_component(part), signal)
+    child = container[key] if isinstance(container, list) else container.get(key)
+    if child is None:
+        child = container[key] = {}
+    elif not isinstance(child, dict):
+        raise ValueError('%s: %s is both a signal and a component' % (signal, part))
+    return child
+
+PROGRESS_INTERVAL = 1.0
+
+# Iterate over items, printing the count (and the total when known) to
+# stderr at most every PROGRESS_INTERVAL seconds
+def with_progress(items, label='signals'):
+    total = len(items) if hasattr(items, '__len__') else None
+    start = last = time.perf_counter()
+    idx = 0
+    for idx, item in enumerate(items, 1):
+        yield item
+        if idx & 0xfff == 0 and time.perf_counter() - last >= PROGRESS_INTERVAL:
+            last = time.perf_counter()
+            print('%d%s %s, %.0f/s' % (idx, '' if total is None else ' / %d' % total, label, idx / (last - start)),
+                  file=sys.stderr)
+    print('%d %s in %.1f s' % (idx, label, time.perf_counter() - start), file=sys.stderr)
+
+# Nested dicts and lists of the values of (name, value) pairs, restricted to
+# the signals in the subtree of prefix. The parent components of a name are
+# looked up by their path, so each signal only parses its last component.
+def parse_signal_arrays(sigs, debug=False, prefix=None):
+    if debug:
+        sigs = with_progress(sigs)
     ret = {}
-    for idx, x in enumerate(sigs):
-        if debug and idx % 100000 == 0:
-            print(idx, len(sigs))
-        var = x[0]
-        val = int(x[1])
-        parsed = var.split('.')
-        curr = ret
-        for idx, name in enumerate(parsed):
-            if '[' in name:
-                is_array = True
-                split = name.split('[')
-                array_len = len(split) - 1
-                idxs = [int(x[:-1]) for x in split[1:]]
-                name = split[0]
-            else:
-                is_array = False
-                
-            if name not in curr:
-                if (not is_array):
-                    if idx == len(parsed) - 1:
-                        curr[name] = val
-                    else:
-                        curr[name] = {}
-                        curr = curr[name]
-                else:
-                    if idx == len(parsed) - 1:
-                        if array_len == 1:
-                            curr[name] = [val]
-                        elif array_len == 2:
-                            curr[name] = [[val]]
-                        elif array_len == 3:
-                            curr[name] = [[[val]]]
-                    else:
-                        if sum(idxs) > 0:
-                            assert()
-                        else:
-                            if array_len == 1:
-                                curr[name] = [{}]
-                                curr = curr[name][0]
-                            elif array_len == 2:
-                                curr[name] = [[{}]]
-                                curr = curr[name][0][0]
-                            elif array_len == 3:
-                                curr[name] = [[[{}]]]
-                                curr = curr[name][0][0][0]
-            else:
-                if (not is_array):
-                    if idx == len(parsed) - 1:
-                        assert()
-                    else:
-                        curr = curr[name]
-                else:
-                    curr_list = curr[name]
-                    for dim in range(array_len - 1):
-                        if len(curr_list) - 1 < idxs[dim]:
-                            curr_list.append([])
-                            curr_list = curr_list[-1]
-                        else:
-                            curr_list = curr_list[idxs[dim]]
-                    if idx == len(parsed) - 1:
-                        curr_list.append(val)
-                    else:
-                        if len(curr_list) - 1 < idxs[-1]:
-                            curr_list.append({})
-                            curr = curr_list[-1]
-                        else:
-                            curr = curr_list[idxs[-1]]
+    parents = {'': ret}
+    for signal, value in sigs:
+        if not in_subtree(signal, prefix):
+            continue
+        path, _, last = signal.rpartition('.')
+        node = parents.get(path)
+        if node is None:
+            node = ret
+            for part in path.split('.'):
+                node = _child(node, part, signal)
+            parents[path] = node
+        container, key = _slot(node, *_parse_component(last), signal)
+        old = container[key] if isinstance(container, list) else container.get(key)
+        if old is not None and isinstance(old, (dict, list)):
+            raise ValueError('%s is both a signal and a component or array' % signal)
+        container[key] = int(value)
     return ret
 
-parser = argparse.ArgumentParser()
-parser.add_argument('--witness_file', type=str, default='../build/dev/witness.json')
-parser.add_argument('--sym_file', type=str, default='../build/dev/dev.sym')
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--witness_file', type=str, default='../build/dev/witness.wtns',
+                        help='binary .wtns, or witness.json')
+    parser.add_argument('--sym_file', type=str, default='../build/dev/dev.sym')
 
-parser.add_argument('--debug', action='store_true', default=False)
-parser.add_argument('--reparse', action='store_true', default=False)
-parser.add_argument('--sig_list_file', type=str, default='../build/dev/dev.sig')
+    parser.add_argument('--debug', action='store_true', default=False)
+    parser.add_argument('--reparse', action='store_true', default=False,
+                        help='rebuild --sig_list_file from the witness even if it exists')
+    parser.add_argument('--sig_list_file', type=str, default=None,
+                        help='optional cache of the [name, value] list')
 
-parser.add_argument('--width', type=int, default=100)
-parser.add_argument('--depth', type=int, default=3)
-args = parser.parse_args()
+    parser.add_argument('--index_file', type=str, default=None,
+                        help='signal index of --sym_file, defaults to <sym_file>.idx')
+    parser.add_argument('--get', type=str, action='append', default=[], help='print the value of a signal')
+    parser.add_argument('--prefix', type=str, action='append', default=[],
+                        help='print the values of the signals whose name starts with PREFIX')
 
-def main():
-    if args.reparse:
-        with open(args.witness_file, 'r') as f:
-            witness = json.load(f)
-
-        with open(args.sym_file, 'r') as f:
-            signal_list = []
-
-            for line in f:
-                count, line_num, template_idx, signal = line.strip().split(',')
-                # count is total count of signals, before optimization
-                # line_num = -1 if it's optimized out I think?
-                count = int(count)
-                line_num = int(line_num)
-                if line_num == -1:
-                    continue
-                else:
-                    signal_list.append([signal, int(witness[line_num])])
+    parser.add_argument('--subtree', type=str, default=None,
+                        help='only build the tree of this component, e.g. main.pairing, through the index')
 
-        with open(args.sig_list_file, 'w') as f:
-            f.write(pprint.pformat(signal_list, compact=True, width=args.width).replace("'", '"'))
-    else:
-        with open(args.sig_list_file, 'r') as f:
-            signal_list = json.loads(f.read())
+    parser.add_argument('--width', type=int, default=100)
+    parser.add_argument('--depth', type=int, default=3)
+    args = parser.parse_args()
+
+    if args.get or args.prefix:
+        with closing(open_index(args.sym_file, args.index_file)) as conn, open_witness(args.witness_file) as witness:
+            for name in args.get:
+                witness_idx = index_get(conn, name)
+                if witness_idx is None:
+                    print('%s: no such signal' % name)
+                elif witness_idx == -1:
+                    print('%s: optimized out' % name)
+                else:
+                    print('%s = %d' % (name, witness[witness_idx]))
+            for prefix in args.prefix:
+                for name, witness_idx in index_prefix(conn, prefix):
+                    print('%s = %d' % (name, witness[witness_idx]))
+        return
 
     print('Parsing')
-    sigs = parse_signal_arrays(signal_list, debug=args.debug)
+    if args.sig_list_file and os.path.exists(args.sig_list_file) and not args.reparse:
+        sigs = parse_signal_arrays(read_sig_cache(args.sig_list_file), debug=args.debug, prefix=args.subtree)
+    elif args.subtree:
+        # Only the values of the subtree are read from the witness
+        with closing(open_index(args.sym_file, args.index_file)) as conn, open_witness(args.witness_file) as witness:
+            signals = ((name, witness[witness_idx]) for name, witness_idx in index_prefix(conn, args.subtree))
+            sigs = parse_signal_arrays(signals, debug=args.debug, prefix=args.subtree)
+    else:
+        with open_witness(args.witness_file) as witness:
+            signals = iter_signals(witness, args.sym_file)
+            if args.sig_list_file:
+                signals = cache_signals(signals, args.sig_list_file)
+            sigs = parse_signal_arrays(signals, debug=args.debug)
     pprint.pprint(sigs, compact=True, width=args.width, depth=args.depth)
 
 if __name__ == '__main__':
@@ -0,0 +1,147 @@
+'''
+Bulk conversion between field elements and the BigInt(n, k) registers of the
+circuit inputs and outputs: register i of x holds bits [n*i, n*(i+1)) of x.
+The layouts are those of field_helper: FQ2 as [c0, c1], FQ12 as the six FQ2
+coefficients of Fp12convert, G1 points as [x, y] and G2 points as
+[[x.c0, x.c1], [y.c0, y.c1]].
+
+Whole arrays are converted at once with shifts and masks. When NumPy is
+installed and n <= 57 encoding cuts the registers from uint64 windows of the
+little-endian bytes of all values at once; set CIRCOM_PAIRING_NUMPY=0 to
+always use plain Python. Decoding with NumPy is slower than plain Python, as
+the registers have to be converted into an array first, and is only used
+with use_numpy=True.
+'''
+
+import os
+
+from curve_field_elements import FQ, FQ2, FQ12
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+USE_NUMPY = np is not None and os.environ.get('CIRCOM_PAIRING_NUMPY', '1') != '0'
+
+# Register layout of the BLS12-381 circuits, BigInt(55, 7)
+N_BITS = 55
+K_REGISTERS = 7
+
+def _use_numpy(use_numpy, n, default=None):
+    if use_numpy is None:
+        use_numpy = USE_NUMPY if default is None else default
+    if use_numpy and np is None:
+        raise ImportError('NumPy is not installed')
+    # A register and its offset within a byte fit in one uint64 window
+    return use_numpy and n + 7 <= 64
+
+# Register j is read from the 8-byte little-endian window starting at byte
+# n*j // 8 of the value, shifted right by n*j % 8
+def _encode_numpy(values, n, k):
+    m, nbytes = len(values), (n * k + 7) // 8
+    buf = np.zeros((m, nbytes + 8), dtype=np.uint8)
+    buf[:, :nbytes] = np.frombuffer(b''.join(v.to_bytes(nbytes, 'little') for v in values),
+                                    dtype=np.uint8).reshape(m, nbytes)
+    out = np.empty((m, k), dtype=np.uint64)
+    mask = np.uint64((1 << n) - 1)
+    for j in range(k):
+        off, shift = divmod(n * j, 8)
+        window = np.ascontiguousarray(buf[:, off:off + 8]).view('<u8')[:, 0]
+        out[:, j] = (window >> np.uint64(shift)) & mask
+    return out.tolist()
+
+def _decode_numpy(regs, n):
+    m, k = regs.shape
+    nbytes = (n * k + 7) // 8
+    buf = np.zeros((m, nbytes + 8), dtype=np.uint8)
+    for j in range(k):
+        off, shift = divmod(n * j, 8)
+        buf[:, off:off + 8] |= (regs[:, j] << np.uint64(shift)).astype('<u8').view(np.uint8).reshape(m, 8)
+    return [int.from_bytes(row, 'little') for row in map(bytes, buf)]
+
+# Split non-negative integers into k registers of n bits each
+def encode_ints(values, n=N_BITS, k=K_REGISTERS, use_numpy=None):
+    values = [int(v) for v in values]
+    for v in values:
+        if v < 0 or v >> (n * k):
+            raise ValueError('%d does not fit in %d registers of %d bits' % (v, k, n))
+    if not values:
+        return []
+    if _use_numpy(use_numpy, n):
+        return _encode_numpy(values, n, k)
+    mask = (1 << n) - 1
+    return [[(v >> (n * i)) & mask for i in range(k)] for v in values]
+
+# Join registers, given as ints or decimal strings, back into integers.
+# Registers wider than n bits or negative, as in unreduced circuit outputs,
+# are carried into the next register.
+def decode_ints(registers, n=N_BITS, use_numpy=None):
+    registers = [[int(r) for r in regs] for regs in registers]
+    if not registers:
+        return []
+    if _use_numpy(use_numpy, n, default=False):
+        try:
+            regs = np.array(registers, dtype=np.uint64)
+        except (OverflowError, ValueError):
+            regs = None
+        if regs is not None and regs.ndim == 2 and not (regs >> np.uint64(n)).any():
+            return _decode_numpy(regs, n)
+    out = []
+    for regs in registers:
+        v = 0
+        for r in reversed(regs):
+            v = (v << n) + r
+        out.append(v)
+    return out
+
+# Group a flat list in consecutive tuples of the given sizes, innermost last
+def _group(flat, *sizes):
+    for size in reversed(sizes):
+        flat = [flat[i:i + size] for i in range(0, len(flat), size)]
+    return flat
+
+def _flatten(nested, depth):
+    for _ in range(depth):
+        nested = [x for xs in nested for x in xs]
+    return nested
+
+def encode_fq(xs, n=N_BITS, k=K_REGISTERS, use_numpy=None):
+    return encode_ints([x.n for x in xs], n, k, use_numpy)
+
+def decode_fq(registers, n=N_BITS, use_numpy=None):
+    return [FQ(v) for v in decode_ints(registers, n, use_numpy)]
+
+def encode_fq2(xs, n=N_BITS, k=K_REGISTERS, use_numpy=None):
+    regs = encode_ints([c for x in xs for c in (x.c0, x.c1)], n, k, use_numpy)
+    return _group(regs, 2)
+
+def decode_fq2(registers, n=N_BITS, use_numpy=None):
+    values = decode_ints(_flatten(registers, 1), n, use_numpy)
+    return [FQ2(c) for c in _group(values, 2)]
+
+def encode_fq12(xs, n=N_BITS, k=K_REGISTERS, use_numpy=None):
+    fq2s = [c for x in xs for c in x.to_fq2_coeffs()]
+    return _group(encode_fq2(fq2s, n, k, use_numpy), 6)
+
+def decode_fq12(registers, n=N_BITS, use_numpy=None):
+    fq2s = decode_fq2(_flatten(registers, 1), n, use_numpy)
+    return [FQ12.from_fq2_coeffs(c) for c in _group(fq2s, 6)]
+
+def encode_g1(pts, n=N_BITS, k=K_REGISTERS, use_numpy=None):
+    return _group(encode_fq([c for pt in pts for c in pt], n, k, use_numpy), 2)
+
+def decode_g1(registers, n=N_BITS, use_numpy=None):
+    return [tuple(pt) for pt in _group(decode_fq(_flatten(registers, 1), n, use_numpy), 2)]
+
+def encode_g2(pts, n=N_BITS, k=K_REGISTERS, use_numpy=None):
+    return _group(encode_fq2([c for pt in pts for c in pt], n, k, use_numpy), 2)
+
+def decode_g2(registers, n=N_BITS, use_numpy=None):
+    return [tuple(pt) for pt in _group(decode_fq2(_flatten(registers, 1), n, use_numpy), 2)]
+
+# Registers as the decimal strings of circuit input files
+def to_strings(registers):
+    if isinstance(registers, list):
+        return [to_strings(r) for r in registers]
+    return str(registers)
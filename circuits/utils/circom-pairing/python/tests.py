@@ -1,9 +1,33 @@
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
 import time
-from curve_field_elements import field_modulus, FQ, FQ2, FQ12
-from curve import double, add, eq, multiply, is_on_curve, neg, b2, b12, curve_order, G1, G2, G12, is_inf
-from pairing import pairing
+from contextlib import closing
+from curve_field_elements import field_modulus, FQ, FQ2, FQ6, FQ12, FQ2Poly, FQ12Poly, batch_inv, \
+  FROBENIUS_FORMAT_VERSION, frobenius_coeffs, _load_frobenius_coeffs, _save_frobenius_coeffs
+from curve import double, add, eq, multiply, is_on_curve, neg, twist, w, b2, b12, curve_order, G1, G2, G12, is_inf, sum_points, multiply_g1, multiply_g2, fixed_base_table, fixed_base_multiply, psi, is_in_g1, is_in_g2, batch_is_in_g1, batch_is_in_g2
+from compression import compress_g1, compress_g2, decompress_g1, decompress_g2
+from hash_to_curve import expand_message_xmd, hash_to_g2
+from bls_preflight import preflight, preflight_circuit_input, compute_signing_root
+import circuit_inputs
+from circuit_inputs import write_sync_committee_input, write_header_input, write_header_inputs
+from circom_constants import generate
+from circuit_vectors import write_vectors
+from wtns_diff import diff_signals, group_diffs
+from witness_decode import decode, check_component
+from circuit_vectors import make_vector
+from parse_wtns import WtnsFile, write_wtns, open_witness, iter_signals, cache_signals, read_sig_cache, parse_signal_arrays, build_index, open_index, index_get, index_prefix
+from registers import USE_NUMPY, encode_ints, decode_ints, encode_fq12, decode_fq12, decode_g1, encode_g2, decode_g2, to_strings
+from field_helper import numberToArray, Fp12convert, convert_out_to_Fp12
+from pairing import self_test, ate_loop_count, pairing, multi_pairing, multi_pairing_is_one, miller_loop, miller_loop_fp2, miller_loop_affine, linefunc, line_equal_fp2, line_unequal_fp2, cast_point_to_fq12, final_exponentiate, final_exponentiate_naive
 
-test_field = False
+self_test()
+print('Self-test passed')
+
+test_field = True
 if test_field:
   print('Starting bn128 tests')
 
@@ -11,6 +35,7 @@ if test_field:
   assert FQ(2) / FQ(7) + FQ(9) / FQ(7) == FQ(11) / FQ(7)
   assert FQ(2) * FQ(7) + FQ(9) * FQ(7) == FQ(11) * FQ(7)
   assert FQ(9) ** field_modulus == FQ(9)
+  assert batch_inv([FQ(2), FQ(0), FQ(7)]) == [FQ(1) / FQ(2), FQ(0), FQ(1) / FQ(7)]
   print('FQ works fine')
 
   x = FQ2([1, 0])
@@ -22,6 +47,11 @@ if test_field:
   assert one / f + x / f == (one + x) / f
   assert one * f + x * f == (one + x) * f
   assert x ** (field_modulus ** 2 - 1) == one
+  assert batch_inv([f, fpx]) == [one / f, one / fpx]
+  assert f.frobenius() == f ** field_modulus
+  assert f.inv().coeffs == FQ2Poly(f.coeffs).inv().coeffs
+  assert f ** -1 == f.inv() and f ** -3 == (f ** 3).inv()
+  assert FQ2Poly(f.coeffs) ** -1 == FQ2Poly(f.coeffs).inv()
   print('FQ2 works fine')
 
   x = FQ12([1] + [0] * 11)
@@ -32,10 +62,25 @@ if test_field:
   assert f / f == one
   assert one / f + x / f == (one + x) / f
   assert one * f + x * f == (one + x) * f
-  # This check takes too long
-  # assert x ** (field_modulus ** 12 - 1) == one
+  assert x ** (field_modulus ** 12 - 1) == one
   print('FQ12 works fine')
 
+  g = FQ12([13, 0, 21, 5, 0, 8, 1, 0, 34, 2, 55, 3])
+  assert (f * g).coeffs == (FQ12Poly(f.coeffs) * FQ12Poly(g.coeffs)).coeffs
+  assert (f / g).coeffs == (FQ12Poly(f.coeffs) / FQ12Poly(g.coeffs)).coeffs
+  assert f.square() == f * f
+  assert f.inv().coeffs == FQ12Poly(f.coeffs).inv().coeffs
+  assert f.c1 / f.c1 == FQ6.one()
+  assert f ** -1 == f.inv() and f ** -5 == (f ** 5).inv() and f.c1 ** -2 == (f.c1 ** 2).inv()
+  assert FQ12.from_fq2_coeffs(f.to_fq2_coeffs()) == f
+  print('FQ12 tower matches flat representation')
+
+  assert f.frobenius() == f ** field_modulus
+  assert f.frobenius(2) == f.frobenius().frobenius()
+  assert f.c0.frobenius(3) == f.c0 ** (field_modulus ** 3)
+  assert final_exponentiate(f) == final_exponentiate_naive(f)
+  print('Frobenius and final exponentiation work fine')
+
   # G1, G2, G12, b, b2, b12, is_inf, is_on_curve, eq, add, double, curve_order, multiply = \
   #   G1, G2, G12, b, b2, b12, is_inf, is_on_curve, eq, add, double, curve_order, multiply
 
@@ -43,12 +88,16 @@ if test_field:
   assert not eq(double(G1), G1)
   assert eq(add(multiply(G1, 9), multiply(G1, 5)), add(multiply(G1, 12), multiply(G1, 2)))
   assert is_inf(multiply(G1, curve_order))
+  assert eq(multiply(G1, -5), neg(multiply(G1, 5)))
+  assert eq(multiply(G1, curve_order - 1), neg(G1))
+  assert eq(sum_points([G1, double(G1), None, multiply(G1, 9), G1]), multiply(G1, 13))
   print('G1 works fine')
 
   assert eq(add(add(double(G2), G2), G2), double(double(G2)))
   assert not eq(double(G2), G2)
   assert eq(add(multiply(G2, 9), multiply(G2, 5)), add(multiply(G2, 12), multiply(G2, 2)))
   assert is_inf(multiply(G2, curve_order))
+  assert eq(multiply(G2, curve_order - 1), neg(G2))
   assert not is_inf(multiply(G2, 2 * field_modulus - curve_order))
   assert is_on_curve(multiply(G2, 9), b2)
   print('G2 works fine')
@@ -60,9 +109,70 @@ if test_field:
   assert is_inf(multiply(G12, curve_order))
   print('G12 works fine')
 
+assert FQ(9).sqrt() ** 2 == FQ(9)
+assert FQ(-1).sqrt() is None
+f = FQ2([1, 2])
+assert f.square().sqrt().square() == f.square()
+assert decompress_g1([compress_g1(G1), compress_g1(neg(G1)), compress_g1(None)]) == [G1, neg(G1), None]
+assert decompress_g2([compress_g2(G2), compress_g2(neg(G2)), compress_g2(None)]) == [G2, neg(G2), None]
+p2 = multiply(G2, 12345)
+assert decompress_g2([compress_g2(p2), compress_g2(neg(p2))]) == [p2, neg(p2)]
+# Infinity is the compression and infinity flags with all other bits zero
+assert compress_g1(None) == bytes([0xc0]) + bytes(47) and compress_g2(None) == bytes([0xc0]) + bytes(95)
+print('Square roots and point compression work fine')
+
+# The Frobenius cache is only used when it is well formed and correct
+with tempfile.TemporaryDirectory() as tmp:
+  path = os.path.join(tmp, 'frobenius_coeffs.json')
+  _save_frobenius_coeffs(path, frobenius_coeffs())
+  assert _load_frobenius_coeffs(path) == frobenius_coeffs()
+  ones = [[[1, 0]] * 6] * 12
+  for cached in [{'format': FROBENIUS_FORMAT_VERSION, 'field_modulus': field_modulus, 'coeffs': ones},
+                 {'format': FROBENIUS_FORMAT_VERSION, 'field_modulus': field_modulus},
+                 {'format': FROBENIUS_FORMAT_VERSION, 'field_modulus': field_modulus, 'coeffs': ones[:11]},
+                 {'format': FROBENIUS_FORMAT_VERSION, 'field_modulus': field_modulus, 'coeffs': [[1] * 6] * 12},
+                 {'field_modulus': field_modulus, 'coeffs': ones}, [], 'coeffs']:
+    with open(path, 'w') as f:
+      json.dump(cached, f)
+    assert _load_frobenius_coeffs(path) is None
+print('Frobenius coefficients cache is checked')
+
+assert is_in_g1(G1) and is_in_g1(None) and not is_in_g1((G1[0], G1[0]))
+# (0, 2) has order 3 and (4, sqrt(68)) is on the curve but not in G1
+assert not is_in_g1((FQ(0), FQ(2))) and not is_in_g1((FQ(4), FQ(68).sqrt()))
+assert batch_is_in_g1([multiply(G1, 5), neg(G1), (FQ(0), FQ(2))]) == [True, True, False]
+assert eq(psi(G2), multiply(G2, field_modulus))
+assert is_in_g2(G2) and is_in_g2(None) and not is_in_g2((G2[0], G2[0]))
+# (2, sqrt(12 + 4u)) is on the twisted curve but not in G2
+assert not is_in_g2((FQ2([2, 0]), (FQ2([2, 0]) ** 3 + b2).sqrt()))
+assert batch_is_in_g2([multiply(G2, 5), neg(G2), (FQ2([2, 0]), (FQ2([2, 0]) ** 3 + b2).sqrt())]) == [True, True, False]
+print('Subgroup checks work fine')
+
 print('Starting pairing tests')
+# Test vectors of RFC 9380, appendices K.1 and J.10.1
+QUUX_DST = b'QUUX-V01-CS02-with-expander-SHA256-128'
+assert expand_message_xmd(b'abc', QUUX_DST, 0x20).hex() == \
+  'd8ccab23b5985ccea865c6c97b6e5b8350e794e603b4b97902f53a8a0d605615'
+assert expand_message_xmd(b'', QUUX_DST, 0x80).hex() == \
+  'af84c27ccfd45d41914fdff5df25293e221afc53d8ad2ac06d5e3e29485dadbee0d121587713a3e0dd4d5e69e93eb7cd4f5df4cd103e188cf60cb02edc3edf18eda8576c412b18ffb658e3dd6ec849469b979d444cf7b26911a08e63cf31f9dcc541708d3491184472c2c29bb749d4286b004ceb5ee6b9a7fa5b646c993f0ced'
+QUUX_G2_DST = b'QUUX-V01-CS02-with-BLS12381G2_XMD:SHA-256_SSWU_RO_'
+assert hash_to_g2(b'', QUUX_G2_DST) == (
+  FQ2([0x0141ebfbdca40eb85b87142e130ab689c673cf60f1a3e98d69335266f30d9b8d4ac44c1038e9dcdd5393faf5c41fb78a,
+       0x05cb8437535e20ecffaef7752baddf98034139c38452458baeefab379ba13dff5bf5dd71b72418717047f5b0f37da03d]),
+  FQ2([0x0503921d7f6a12805e72940b963c0cf3471c7b2a524950ca195d11062ee75ec076daf2d4bc358c4b190c0c98064fdd92,
+       0x12424ac32561493f3fe3c260708a12b7c620e7be00099a974e259ddc7d1f6395c3c811cdd19f1e8dbf3e9ecfdcbab8d6]))
+assert hash_to_g2(b'abc', QUUX_G2_DST) == (
+  FQ2([0x02c2d18e033b960562aae3cab37a27ce00d80ccd5ba4b7fe0e7a210245129dbec7780ccc7954725f4168aff2787776e6,
+       0x139cddbccdc5e91b9623efd38c49f81a6f83f175e80b06fc374de9eb4b41dfe4ca3a230ed250fbe3a2acf73a41177fd8]),
+  FQ2([0x1787327b68159716a37440985269cf584bcb1e621d3a7202be6ea05c4cfe244aeb197642555a0645fb87bf7466b2ba48,
+       0x00aa65dae3c8d732d10ecd2c50f8a1baf3001578f71c694e03866e9f3d49ac1e1ce70dd94a733534f106d4cec0eddd16]))
+assert is_inf(multiply(hash_to_g2(b'abc'), curve_order))
+print('Hash to G2 matches the test vectors')
+
 a = time.time()
 p1 = pairing(G2, G1)
+assert p1 == miller_loop(G12, cast_point_to_fq12(G1))
+print('Pairing matches the reference FQ12 Miller loop')
 pn1 = pairing(G2, neg(G1))
 assert p1 * pn1 == FQ12.one()
 print('Pairing check against negative in G1 passed')
@@ -84,4 +194,266 @@ p3 = pairing(multiply(G2, 27), multiply(G1, 37))
 po3 = pairing(G2, multiply(G1, 999))
 assert p3 == po3
 print('Composite check passed')
-print('Total time for pairings: %.3f' % (time.time() - a))
\ No newline at end of file
+assert multi_pairing([(G2, G1), (multiply(G2, 2), G1)]) == p1 * po2
+assert multi_pairing_is_one([(multiply(G2, 27), multiply(G1, 37)), (G2, neg(multiply(G1, 999)))])
+assert not multi_pairing_is_one([(G2, G1), (G2, G1)])
+print('Multi-pairing check passed')
+
+print('Total time for pairings: %.3f' % (time.time() - a))
+
+scalars = [0, 1, 2, 255, 256, curve_order - 1, curve_order, 2 ** 255 - 1, -5, 0x1234567890abcdef << 200]
+for n in scalars:
+  assert multiply_g1(n) == multiply(G1, n % curve_order)
+  assert multiply_g2(n) == multiply(G2, n % curve_order)
+with tempfile.TemporaryDirectory() as tmp:
+  # A table for another fixed point, stored and loaded again
+  pt = multiply(G1, 37)
+  table = fixed_base_table(pt, w=4, cache_dir=tmp)
+  assert len(os.listdir(tmp)) == 1 and fixed_base_table(pt, w=4, cache_dir=tmp) == table
+  assert [fixed_base_multiply(table, n) for n in scalars] == [multiply(pt, n % curve_order) for n in scalars]
+print('Fixed-base multiplication matches multiply')
+
+with tempfile.TemporaryDirectory() as tmp:
+  vectors = {}
+  for op, count in [('fp12_multiply', 20), ('final_exponentiate', 3), ('miller_loop', 2), ('pairing', 2)]:
+    path = os.path.join(tmp, op + '.jsonl')
+    write_vectors(path, op, count, seed=7, workers=1)
+    with open(path, 'r') as f:
+      vectors[op] = f.read()
+    # The same vectors from a pool of workers
+    write_vectors(path, op, count, seed=7, workers=2)
+    with open(path, 'r') as f:
+      assert f.read() == vectors[op]
+  records = [json.loads(line) for line in vectors['fp12_multiply'].splitlines()]
+  assert len(records) == 20 and [r['index'] for r in records] == list(range(20))
+  for r in records:
+    a, b, out = decode_fq12([r['input']['a'], r['input']['b'], r['output']['out']])
+    assert a * b == out
+  # The line functions of the circuit are those of the untwisted points,
+  # scaled by w**6
+  R, S, Q = multiply(G2, 5), multiply(G2, 11), multiply(G1, 7)
+  assert line_equal_fp2(R, Q) == linefunc(twist(R), twist(R), cast_point_to_fq12(Q)) * w ** 6
+  assert line_unequal_fp2(R, S, Q) == linefunc(twist(R), twist(S), cast_point_to_fq12(Q)) * w ** 6
+  for line in vectors['miller_loop'].splitlines():
+    r = json.loads(line)
+    P, xP = decode_g2([r['input']['P'], r['output']['xP']])
+    Q = decode_g1([r['input']['Q']])[0]
+    assert xP == multiply(P, ate_loop_count)
+    # OptimalAtePairing runs the Miller loop on -P
+    assert final_exponentiate(decode_fq12([r['output']['out']])[0]) == pairing(neg(P), Q)
+print('Circuit test vectors are reproducible')
+
+xs = [0, 1, field_modulus - 1, 2 ** 385 - 1]
+for use_numpy in (False, None) + ((True,) if USE_NUMPY else ()):
+  assert encode_ints(xs, use_numpy=use_numpy) == [numberToArray(x, 55, 7) for x in xs]
+  assert decode_ints(to_strings(encode_ints(xs, use_numpy=use_numpy)), use_numpy=use_numpy) == xs
+  assert encode_fq12([p1, p2], use_numpy=use_numpy) == [Fp12convert(p1, 55, 7), Fp12convert(p2, 55, 7)]
+  assert decode_fq12([Fp12convert(p1, 55, 7)], use_numpy=use_numpy) == [p1]
+  assert decode_g2(encode_g2([G2, neg(G2)], use_numpy=use_numpy), use_numpy=use_numpy) == [G2, neg(G2)]
+# Unreduced registers carry into the next one
+assert decode_ints([[2 ** 55, -1, 1]]) == [2 ** 110]
+assert convert_out_to_Fp12([r for c in Fp12convert(p1, 55, 7) for regs in c for r in regs], 55, 7) == p1
+print('Register codec round-trips with field_helper')
+
+with open('../../../verify_header/input/6154570_input.json', 'r') as f:
+  header_input = json.load(f)
+assert preflight_circuit_input(header_input) == (True, 374)
+header_input['signing_root'][0] = str(int(header_input['signing_root'][0]) ^ 1)
+assert preflight_circuit_input(header_input) == (False, 374)
+# A synthetic update signed by three keys; a participating pubkey at infinity
+# is rejected even though it does not change the aggregate
+header = {'slot': 1, 'proposerIndex': 2, 'parentRoot': '00' * 32, 'stateRoot': '11' * 32, 'bodyRoot': '22' * 32}
+root = compute_signing_root(header, '0x01000000', '33' * 32)
+pubkeys, bits = [compress_g1(G1)] * 512, [0] * 512
+for i, sk in [(0, 3), (100, 5), (511, 7)]:
+  pubkeys[i], bits[i] = compress_g1(multiply_g1(sk)), 1
+update = {'attestedHeader': header, 'syncCommitteeBits': bits,
+          'syncCommitteeSignature': compress_g2(multiply(hash_to_g2(root), 15)).hex()}
+assert preflight(update, pubkeys, '0x01000000', '33' * 32) == (True, 3)
+pubkeys[200], bits[200] = compress_g1(None), 1
+assert preflight(update, pubkeys, '0x01000000', '33' * 32) == (False, 4)
+print('Aggregate BLS preflight passed')
+
+with open('../../../verify_syncCommittee/input/727_input.json', 'r') as f:
+  sync_input = f.read()
+with tempfile.TemporaryDirectory() as tmp:
+  data = json.loads(sync_input)
+  write_sync_committee_input(os.path.join(tmp, 'input.json'), data['pubkeyHex'], data['aggregatePubkeyHex'])
+  with open(os.path.join(tmp, 'input.json'), 'r') as f:
+    assert f.read() == sync_input
+print('verify_syncCommittee input regenerated')
+
+# The update of slot 6154570 is not in the tree, only its input file: the
+# update is rebuilt from the pubkeys, bits and signature there, with the
+# signing root of its attested header
+with open('../../../verify_header/input/6154570_input.json', 'r') as f:
+  header_input = json.load(f)
+update = {'attestedHeader': None, 'syncCommitteeBits': header_input['pubkeybits'],
+          'syncCommitteeSignature': compress_g2(decode_g2([header_input['signature']])[0]).hex()}
+pubkeys = [compress_g1(pk).hex() for pk in decode_g1(header_input['pubkeys'])]
+signing_root = bytes(int(v) for v in header_input['signing_root'])
+compute_signing_root_of = circuit_inputs.compute_signing_root
+circuit_inputs.compute_signing_root = lambda header, fork_version, genesis_validators_root: signing_root
+try:
+  with tempfile.TemporaryDirectory() as tmp:
+    write_header_input(os.path.join(tmp, 'input.json'), update, pubkeys, '0x00000000', '00' * 32)
+    with open(os.path.join(tmp, 'input.json'), 'r') as f:
+      assert json.load(f) == header_input
+finally:
+  circuit_inputs.compute_signing_root = compute_signing_root_of
+# Header inputs of synthetic updates of three periods, written in parallel
+config = {'forkVersion': '0x01000000', 'genesisValidatorRoot': '33' * 32}
+with tempfile.TemporaryDirectory() as tmp:
+  updates_dir, pubkeys_dir, out_dir = [os.path.join(tmp, name) for name in ['updates', 'pubkeys', 'out']]
+  for d in [updates_dir, pubkeys_dir, out_dir]:
+    os.makedirs(d)
+  for slot, sks in [(100, [3, 5]), (8200, [7, 11, 13]), (20000, [9])]:
+    pubkeys, bits = [compress_g1(G1).hex()] * 512, [0] * 512
+    for i, sk in enumerate(sks):
+      pubkeys[40 * i + 1], bits[40 * i + 1] = compress_g1(multiply_g1(sk)).hex(), 1
+    with open(os.path.join(pubkeys_dir, '%d.json' % (slot // 8192)), 'w') as f:
+      json.dump({'pubkeyHex': pubkeys}, f)
+    header = {'slot': slot + 2, 'proposerIndex': slot, 'parentRoot': '00' * 32, 'stateRoot': '11' * 32, 'bodyRoot': '22' * 32}
+    root = compute_signing_root(header, config['forkVersion'], config['genesisValidatorRoot'])
+    with open(os.path.join(updates_dir, '%d.json' % slot), 'w') as f:
+      json.dump({'attestedHeader': header, 'finalizedHeader': {'slot': slot}, 'syncCommitteeBits': bits,
+                 'syncCommitteeSignature': compress_g2(multiply(hash_to_g2(root), sum(sks))).hex()}, f)
+  # Slot 20000 is outside the range
+  paths = write_header_inputs(updates_dir, 0, 10000, pubkeys_dir, config, out_dir, workers=2)
+  assert paths == [os.path.join(out_dir, '%d_input.json' % slot) for slot in [100, 8200]]
+  results = []
+  for path in paths:
+    with open(path, 'r') as f:
+      results.append(preflight_circuit_input(json.load(f)))
+  assert results == [(True, 2), (True, 3)]
+print('verify_header inputs regenerated')
+
+# A witness of the BN254 scalar field as written by circom, with one signal
+# optimized out
+bn254_r = 21888242871839275222246405745257275088548364400416034343698204186575808495617
+sym = ['1,1,0,main.out', '2,2,0,main.a[0]', '3,3,0,main.a[1]', '4,-1,1,main.m.x', '5,4,1,main.m.y[0][1]']
+values = [1, 7, 11, bn254_r - 1, 2 ** 200]
+with tempfile.TemporaryDirectory() as tmp:
+  with open(os.path.join(tmp, 'dev.sym'), 'w') as f:
+    f.write('\n'.join(sym) + '\n')
+  write_wtns(os.path.join(tmp, 'witness.wtns'), values, bn254_r)
+  with open(os.path.join(tmp, 'witness.json'), 'w') as f:
+    json.dump([str(v) for v in values], f)
+  with WtnsFile(os.path.join(tmp, 'witness.wtns')) as witness:
+    assert (witness.prime, witness.n8, len(witness), list(witness)) == (bn254_r, 32, 5, values)
+  expected = [['main.out', 7], ['main.a[0]', 11], ['main.a[1]', bn254_r - 1], ['main.m.y[0][1]', 2 ** 200]]
+  for name in ['witness.wtns', 'witness.json']:
+    with open_witness(os.path.join(tmp, name)) as witness:
+      assert [list(x) for x in iter_signals(witness, os.path.join(tmp, 'dev.sym'))] == expected
+  with open_witness(os.path.join(tmp, 'witness.wtns')) as witness:
+    cached = list(cache_signals(iter_signals(witness, os.path.join(tmp, 'dev.sym')), os.path.join(tmp, 'dev.sig')))
+  assert read_sig_cache(os.path.join(tmp, 'dev.sig')) == expected == [list(x) for x in cached]
+  assert parse_signal_arrays(cached)['main']['a'] == [11, bn254_r - 1]
+  index_path = build_index(os.path.join(tmp, 'dev.sym'))
+  with closing(open_index(os.path.join(tmp, 'dev.sym'))) as conn:
+    assert [index_get(conn, name) for name in ['main.a[1]', 'main.m.x', 'main.b']] == [3, -1, None]
+    assert list(index_prefix(conn, 'main.a')) == [('main.a[0]', 2), ('main.a[1]', 3)]
+    assert [name for name, _ in index_prefix(conn, 'main.m', removed=True)] == ['main.m.x', 'main.m.y[0][1]']
+    assert len(list(index_prefix(conn, ''))) == 4
+  # Rebuilt only when the .sym file changes
+  mtime = os.stat(index_path).st_mtime_ns
+  assert build_index(os.path.join(tmp, 'dev.sym')) == index_path and os.stat(index_path).st_mtime_ns == mtime
+  with open(os.path.join(tmp, 'dev.sym'), 'a') as f:
+    f.write('6,5,1,main.b\n')
+  with closing(open_index(os.path.join(tmp, 'dev.sym'))) as conn:
+    assert index_get(conn, 'main.b') == 5
+# Arrays of any dimension, filled in any order, and subtrees
+sigs = [['main.f[1][0][2][1]', 5], ['main.f[0][0][0][0]', 1], ['main.c[1].x', 2], ['main.c[0].y[1]', 3], ['main.cc', 4]]
+assert parse_signal_arrays(sigs) == {'main': {
+  'f': [[[[1]]], [[None, None, [None, 5]]]], 'c': [{'y': [None, 3]}, {'x': 2}], 'cc': 4}}
+assert parse_signal_arrays(sigs, prefix='main.c') == {'main': {'c': [{'y': [None, 3]}, {'x': 2}]}}
+assert parse_signal_arrays(sigs, prefix='main.c[1]') == {'main': {'c': [None, {'x': 2}]}}
+try:
+  parse_signal_arrays([['main.a.b', 1], ['main.a', 2]])
+  assert False
+except ValueError:
+  pass
+print('Witness and symbol files are read lazily')
+
+with tempfile.TemporaryDirectory() as tmp:
+  # Two runs of a 40-signal circuit differing in a few values, in chunks of 8
+  sym_path, path_a, path_b = [os.path.join(tmp, name) for name in ['d.sym', 'a.wtns', 'b.wtns']]
+  with open(sym_path, 'w') as f:
+    f.write(''.join('%d,%d,0,main.c%d.x[%d]\n' % (i, i if i != 30 else -1, i // 10, i % 10) for i in range(1, 40)))
+  values = list(range(40))
+  write_wtns(path_a, values, bn254_r)
+  for i in [3, 17, 18, 30, 39]:
+    values[i] = bn254_r - values[i]
+  write_wtns(path_b, values, bn254_r)
+  for workers in [1, 2]:
+    diffs = list(diff_signals(path_a, path_b, sym_path, workers, chunk_values=8))
+    assert diffs == [('main.c0.x[3]', 3), ('main.c1.x[7]', 17), ('main.c1.x[8]', 18), ('main.c3.x[9]', 39)]
+  assert group_diffs(diffs, depth=2) == {
+    'main.c0': (1, 'main.c0.x[3]', 3), 'main.c1': (2, 'main.c1.x[7]', 17), 'main.c3': (1, 'main.c3.x[9]', 39)}
+  assert list(diff_signals(path_a, path_a, sym_path)) == []
+  for chunk_values in [0, 12]:
+    try:
+      list(diff_signals(path_a, path_b, sym_path, chunk_values=chunk_values))
+      assert False
+    except ValueError:
+      pass
+print('Witness diff maps differences to signals')
+
+# A witness of Miller loop and final exponentiation components, one of them
+# wrong, decoded and checked against the reference
+def flat_signals(path, node):
+  if isinstance(node, list):
+    return [s for i, x in enumerate(node) for s in flat_signals('%s[%d]' % (path, i), x)]
+  return [(path, int(node))]
+# The second Miller loop is off by factors that the final exponentiation
+# removes, and must not pass
+ml = make_vector('miller_loop', 3, 0)
+ml_P, ml_Q = decode_g2([ml['input']['P']])[0], decode_g1([ml['input']['Q']])[0]
+ml_off = miller_loop_fp2(neg(ml_P), ml_Q)
+assert final_exponentiate(ml_off) == final_exponentiate(miller_loop_affine(ml_P, ml_Q)[0])
+components = [('main.ml[0]', {**ml['input'], **ml['output']}),
+              ('main.ml[1]', {**ml['input'], **ml['output'], 'out': to_strings(encode_fq12([ml_off])[0])})] + \
+  [('main.fe[%d]' % i, {**v['input'], **v['output']}) for i, v in
+   enumerate(make_vector('final_exponentiate', 3, i) for i in range(2))]
+signals = [(name, value) for path, regs_of in components for signal, regs in regs_of.items()
+           for name, value in flat_signals(path + '.' + signal, regs)]
+signals[-1] = (signals[-1][0], signals[-1][1] ^ 1)
+with tempfile.TemporaryDirectory() as tmp:
+  with open(os.path.join(tmp, 'dev.sym'), 'w') as f:
+    f.write(''.join('%d,%d,0,%s\n' % (i + 1, i + 1, name) for i, (name, _) in enumerate(signals)))
+  write_wtns(os.path.join(tmp, 'witness.wtns'), [1] + [value for _, value in signals], bn254_r)
+  with open_witness(os.path.join(tmp, 'witness.wtns')) as witness:
+    tree = parse_signal_arrays(iter_signals(witness, os.path.join(tmp, 'dev.sym')))
+assert check_component(tree, 'main.ml[*]', 'miller_loop') == [('main.ml[0]', True), ('main.ml[1]', False)]
+assert check_component(tree, 'main.fe[*]', 'final_exponentiate') == [('main.fe[0]', True), ('main.fe[1]', False)]
+assert decode(tree['main']['ml'][0]['Q'], kind='g1') == ml_Q
+assert len(decode([fe['in'] for fe in tree['main']['fe']])) == 2
+# Negative registers of unreduced values are stored as bn254_r - x
+assert decode([2 ** 55 + 5, bn254_r - 1, 0, 0, 0, 0, 0]) == FQ(5)
+print('Witness components decode and check against the reference')
+
+# The generated tables hold the registers of the hand-written 55/7 ones, in order
+def circom_registers(src, func):
+  body = src[src.index('function %s(' % func):]
+  body = body[:body.index('\n}')]
+  branch = re.search(r'if\( *n *== *55 *&& *k *== *7 *\)', body)
+  return re.findall(r'\d{6,}', body[branch.end():] if branch else body)
+with open('../circuits/bls12_381_func.circom', 'r') as f:
+  func_src = f.read()
+with tempfile.TemporaryDirectory() as tmp:
+  path, written = generate(55, 7, out_dir=tmp)
+  assert written and generate(55, 7, out_dir=tmp) == (path, False)
+  with open(path, 'r') as f:
+    generated = f.read()
+for name in ['get_BLS12_381_prime', 'get_generator_G1', 'get_generator_G2', 'get_Fp12_frobenius', 'get_iso3_coeffs']:
+  assert circom_registers(generated, name + '_55_7') == circom_registers(func_src, name), name
+print('Generated circom constants match bls12_381_func.circom')
+
+# Importing the pairing engine should not compute anything; the budget covers
+# the interpreter's own imports and gmpy2
+IMPORT_BUDGET = 0.2
+snippet = 'import time; t = time.perf_counter(); import pairing; print(time.perf_counter() - t)'
+import_time = min(float(subprocess.run([sys.executable, '-c', snippet], capture_output=True, text=True,
+                                       check=True).stdout) for _ in range(3))
+assert import_time < IMPORT_BUDGET, import_time
+print('Import time of pairing: %.3f s' % import_time)
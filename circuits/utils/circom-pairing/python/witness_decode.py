@@ -0,0 +1,187 @@
+'''
+Decodes the BigInt(n, k) registers of a witness, as parsed by parse_wtns,
+into field elements and points of this library, and checks components against
+the Python reference.
+
+A path names a signal or a component of the parsed tree, e.g.
+main.pairing.miller.out; an index [*] selects every instance of an array of
+components, as main.pairing.sq[*].out. The kind of a signal is inferred from
+its shape, the last dimension being k:
+
+  [k]        FQ
+  [2][k]     FQ2, or a G1 point with kind='g1'
+  [2][2][k]  G2 point
+  [6][2][k]  FQ12
+
+and any dimensions before those decode as nested lists of instances. The
+registers are read as signed: values above prime / 2 in the witness are the
+negative registers of unreduced results.
+
+  python3 witness_decode.py --get main.pairing.out --get main.pairing.miller
+  python3 witness_decode.py --check main.pairing=pairing --check main.fe[*]=final_exponentiate
+'''
+
+import argparse
+import re
+from contextlib import closing
+
+from pairing import miller_loop_affine, final_exponentiate, pairing
+from registers import N_BITS, decode_fq, decode_fq2, decode_fq12, decode_g1, decode_g2
+from parse_wtns import open_index, open_witness, index_prefix, in_subtree, parse_signal_arrays
+
+# Scalar field of BN254, the field of the circom witnesses
+BN254_R = 21888242871839275222246405745257275088548364400416034343698204186575808495617
+
+_PATH_PART = re.compile(r'([^\[\]]+)((?:\[(?:\d+|\*)\])*)')
+
+# [(path, node)] of the nodes of tree at path, one per instance when it has [*]
+def resolve(tree, path):
+    nodes = [('', tree)]
+    for part in path.split('.'):
+        m = _PATH_PART.fullmatch(part)
+        if m is None:
+            raise ValueError('cannot parse path component %r' % part)
+        name, idxs = m.group(1), re.findall(r'\[(\d+|\*)\]', m.group(2))
+        out = []
+        for prefix, node in nodes:
+            if not isinstance(node, dict) or name not in node:
+                raise KeyError('%s%s not in the witness' % (prefix + '.' if prefix else '', name))
+            found = [(prefix + '.' + name if prefix else name, node[name])]
+            for idx in idxs:
+                found = [('%s[%d]' % (p, i), x) for p, arr in found for i, x in enumerate(arr)
+                         if x is not None and (idx == '*' or i == int(idx))]
+            out += found
+        nodes = out
+    return nodes
+
+def _shape(node):
+    shape = []
+    while isinstance(node, list):
+        if not node or any(x is None for x in node):
+            raise ValueError('signal array with missing entries')
+        shape.append(len(node))
+        node = node[0]
+    if not isinstance(node, int):
+        raise ValueError('not a signal array')
+    return shape
+
+# The kind of a signal array and the number of its leading dimensions
+def infer_kind(node, kind=None):
+    shape = _shape(node)
+    for name, tail in [('fq12', [6, 2]), ('g2', [2, 2]), ('fq2', [2]), ('fq', [])]:
+        if len(shape) > len(tail) and shape[-1 - len(tail):-1] == tail:
+            if kind is None or kind == name or (kind == 'g1' and name == 'fq2'):
+                return kind or name, len(shape) - len(tail) - 1
+    raise ValueError('cannot decode an array of shape %s as %s' % (shape, kind or 'a field element'))
+
+_DECODERS = {'fq': decode_fq, 'fq2': decode_fq2, 'g1': decode_g1, 'g2': decode_g2, 'fq12': decode_fq12}
+
+def _signed(node, prime):
+    if isinstance(node, list):
+        return [_signed(x, prime) for x in node]
+    return node - prime if node > prime // 2 else node
+
+def _split(node, depth):
+    for _ in range(depth):
+        node = [x for xs in node for x in xs]
+    return node
+
+def _nest(flat, sizes):
+    for size in reversed(sizes):
+        flat = [flat[i:i + size] for i in range(0, len(flat), size)]
+    return flat
+
+# Decode a signal array, instances of its leading dimensions in one call
+def decode(node, n=N_BITS, kind=None, prime=BN254_R):
+    kind, depth = infer_kind(node, kind)
+    sizes = _shape(node)[:depth]
+    values = _DECODERS[kind](_split([_signed(node, prime)], depth), n)
+    return _nest(values, sizes)[0]
+
+# {signal name: decoded value} of the signal arrays of a component. Signals
+# that are not field elements, such as flags and sub-components, are skipped.
+def decode_component(node, n=N_BITS, prime=BN254_R, kinds=None):
+    out = {}
+    for name, value in node.items():
+        if isinstance(value, dict):
+            continue
+        try:
+            out[name] = decode(value, n, (kinds or {}).get(name), prime)
+        except ValueError:
+            pass
+    return out
+
+# Checks of the components of the circuits against the reference, with the
+# names of circuit_vectors. The Miller loop is checked exactly against
+# miller_loop_affine, which evaluates the line functions of the circuit.
+def _check_fp12_multiply(s):
+    return s['out'] == s['a'] * s['b']
+
+def _check_final_exponentiate(s):
+    return s['out'] == final_exponentiate(s['in'])
+
+def _check_miller_loop(s):
+    return (s['out'], s['xP']) == miller_loop_affine(s['P'], s['Q'])
+
+def _check_pairing(s):
+    return s['out'] == pairing(s['P'], s['Q'])
+
+CHECKS = {
+    'fp12_multiply': (_check_fp12_multiply, {}),
+    'final_exponentiate': (_check_final_exponentiate, {}),
+    'miller_loop': (_check_miller_loop, {'Q': 'g1'}),
+    'pairing': (_check_pairing, {'Q': 'g1'}),
+}
+
+# [(instance path, passed)] for every instance of the component at path
+def check_component(tree, path, op, n=N_BITS, prime=BN254_R):
+    check, kinds = CHECKS[op]
+    return [(p, check(decode_component(node, n, prime, kinds))) for p, node in resolve(tree, path)]
+
+# The part of a path before its first [*], to select the signals to parse
+def _path_prefix(path):
+    return path.split('[*]')[0]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--witness_file', type=str, default='../build/dev/witness.wtns')
+    parser.add_argument('--sym_file', type=str, default='../build/dev/dev.sym')
+    parser.add_argument('--index_file', type=str, default=None)
+    parser.add_argument('--n', type=int, default=N_BITS, help='bits per register')
+    parser.add_argument('--prime', type=int, default=BN254_R, help='field of the witness')
+    parser.add_argument('--get', type=str, action='append', default=[], help='print the decoded signal or component')
+    parser.add_argument('--kind', type=str, default=None, choices=sorted(_DECODERS), help='kind of the --get signals')
+    parser.add_argument('--check', type=str, action='append', default=[], metavar='PATH=OP',
+                        help='check a component against the reference, OP one of %s' % ', '.join(CHECKS))
+    args = parser.parse_args()
+
+    checks = [tuple(c.rsplit('=', 1)) for c in args.check]
+    for c in checks:
+        if len(c) != 2 or c[1] not in CHECKS:
+            parser.error('--check needs PATH=OP with OP one of %s' % ', '.join(CHECKS))
+    prefixes = [_path_prefix(p) for p in args.get] + [_path_prefix(p) for p, _ in checks]
+    if not prefixes:
+        parser.error('nothing to do without --get or --check')
+
+    # Only the signals below the requested paths are read and parsed, in one
+    # pass through the index
+    with closing(open_index(args.sym_file, args.index_file)) as conn, open_witness(args.witness_file) as witness:
+        signals = ((name, witness[witness_idx]) for prefix in sorted(set(prefixes))
+                   for name, witness_idx in index_prefix(conn, prefix))
+        tree = parse_signal_arrays((s for s in signals if any(in_subtree(s[0], p) for p in prefixes)))
+
+    for path in args.get:
+        for p, node in resolve(tree, path):
+            value = decode_component(node, args.n, args.prime) if isinstance(node, dict) else \
+                decode(node, args.n, args.kind, args.prime)
+            print('%s = %s' % (p, value))
+    failed = 0
+    for path, op in checks:
+        for p, ok in check_component(tree, path, op, args.n, args.prime):
+            failed += not ok
+            print('%s %s: %s' % (op, p, 'ok' if ok else 'MISMATCH'))
+    if failed:
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+'''
+Diff of two witnesses of the same circuit, e.g. of a slot whose proof fails
+and of one that succeeded. The .wtns files are compared in chunks of values
+on a process pool, each chunk as raw bytes first and value by value only when
+it differs. The result is a bitmap with one bit per witness value, so memory
+stays bounded by the witness length / 8. The differing values are mapped back
+to signal names through the .sym file and grouped by component.
+
+  python3 wtns_diff.py a.wtns b.wtns --sym_file ../build/dev/dev.sym --depth 3
+'''
+
+import argparse
+
+from parallel import pool_imap
+from parse_wtns import WtnsFile, iter_sym
+
+# Values per worker task, chunk_values must be a multiple of 8
+CHUNK_VALUES = 1 << 20
+# Values compared at once inside a differing chunk
+BLOCK_VALUES = 256
+
+def _diff_chunk(args):
+    path_a, path_b, start, stop = args
+    with WtnsFile(path_a) as a, WtnsFile(path_b) as b:
+        raw_a, raw_b = a.raw(start, stop), b.raw(start, stop)
+        n8 = a.n8
+    if raw_a == raw_b:
+        return start, None
+    bits = bytearray((stop - start + 7) // 8)
+    block = BLOCK_VALUES * n8
+    for pos in range(0, len(raw_a), block):
+        if raw_a[pos:pos + block] == raw_b[pos:pos + block]:
+            continue
+        for off in range(pos, min(pos + block, len(raw_a)), n8):
+            if raw_a[off:off + n8] != raw_b[off:off + n8]:
+                i = off // n8
+                bits[i >> 3] |= 1 << (i & 7)
+    return start, bytes(bits)
+
+def _merge_chunks(bitmap, chunks):
+    for start, bits in chunks:
+        if bits is not None:
+            bitmap[start // 8:start // 8 + len(bits)] = bits
+
+# Bitmap of the witness indices whose values differ: bit i % 8 of byte i // 8
+def diff_witnesses(path_a, path_b, workers=None, chunk_values=CHUNK_VALUES):
+    # Chunks are copied into the bitmap whole bytes at a time
+    if chunk_values <= 0 or chunk_values % 8:
+        raise ValueError('chunk_values must be a positive multiple of 8, got %d' % chunk_values)
+    with WtnsFile(path_a) as a, WtnsFile(path_b) as b:
+        if (a.prime, a.n8, len(a)) != (b.prime, b.n8, len(b)):
+            raise ValueError('%s and %s are not witnesses of the same circuit' % (path_a, path_b))
+        n_witness = len(a)
+    tasks = [(path_a, path_b, start, min(start + chunk_values, n_witness))
+             for start in range(0, n_witness, chunk_values)]
+    bitmap = bytearray((n_witness + 7) // 8)
+    _merge_chunks(bitmap, pool_imap(_diff_chunk, tasks, workers))
+    return bitmap
+
+# (name, witness index) of the signals whose values differ, in the order of
+# the .sym file
+def diff_signals(path_a, path_b, sym_path, workers=None, chunk_values=CHUNK_VALUES):
+    bitmap = diff_witnesses(path_a, path_b, workers, chunk_values)
+    if not any(bitmap):
+        return
+    for signal, witness_idx in iter_sym(sym_path):
+        if bitmap[witness_idx >> 3] >> (witness_idx & 7) & 1:
+            yield signal, witness_idx
+
+# The first depth components of a signal name
+def component_prefix(signal, depth):
+    return '.'.join(signal.split('.')[:depth])
+
+# {prefix: (count, first signal, its witness index)} of the differing
+# signals, in the order the prefixes first differ
+def group_diffs(diffs, depth=3):
+    groups = {}
+    for signal, witness_idx in diffs:
+        prefix = component_prefix(signal, depth)
+        if prefix in groups:
+            count, first, first_idx = groups[prefix]
+            groups[prefix] = (count + 1, first, first_idx)
+        else:
+            groups[prefix] = (1, signal, witness_idx)
+    return groups
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('witness_a', type=str)
+    parser.add_argument('witness_b', type=str)
+    parser.add_argument('--sym_file', type=str, default='../build/dev/dev.sym')
+    parser.add_argument('--depth', type=int, default=3, help='components of the names to group by')
+    parser.add_argument('--limit', type=int, default=50, help='groups to print')
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    groups = group_diffs(diff_signals(args.witness_a, args.witness_b, args.sym_file, args.workers), args.depth)
+    if not groups:
+        print('witnesses are equal')
+        return
+    total = sum(count for count, _, _ in groups.values())
+    print('%d differing signals in %d components' % (total, len(groups)))
+    with WtnsFile(args.witness_a) as a, WtnsFile(args.witness_b) as b:
+        for prefix, (count, first, witness_idx) in list(groups.items())[:args.limit]:
+            print('%8d  %s' % (count, prefix))
+            print('          first %s: %d != %d' % (first, a[witness_idx], b[witness_idx]))
+    if len(groups) > args.limit:
+        print('... %d more components' % (len(groups) - args.limit))
+
+if __name__ == '__main__':
+    main()